@@ -1,18 +1,32 @@
 import argparse
+import asyncio
+import csv
+import functools
 import json
+import os
+import signal
+import stat
 import yaml
 import z3
 import sys
-import re
 from collections import deque
+from fractions import Fraction
 from syntheos.boolparser import boolparse
 from syntheos.hoaparser import *
 from syntheos.datatypes import *
+from syntheos.atomcompiler import compiletranstab, evallabel
+from syntheos.scheduler import labelsymbols
+from syntheos.mealyfile import MealyFile, ismealyfile, convertmealy
 
 class Shield:
-  def __init__(self, node, variables):
+  def __init__(self, node, variables, atoms):
     self.node = node
     self.variables = variables
+    self.atoms = atoms
+    self.sysvars = [v["name"] for v in variables if v["owner"] == "system"]
+    self.bits = {k: 1 << i for i, k in enumerate(sorted(atoms))}
+    self.nodebits = {}
+    self.index = {}
 
   def gettypeof(self, nm):
     while nm.startswith("FETCH_"):
@@ -26,29 +40,198 @@ class Shield:
     """
     Checks if a model satisfies the given Z3 expression.
     """
-    for k, v in val.items():
-      expr = z3.substitute(expr, (z3tycons(self.gettypeof(k))(k), z3valcons(self.gettypeof(k))(v)))
-    solver = z3.Solver()
+    expr = z3.substitute(expr, *((z3tycons(self.gettypeof(k))(k), z3valcons(self.gettypeof(k))(v)) for k, v in val.items()))
+    # The plain SMT core: it avoids the setup of the default solver, which
+    # is most of the time of these small queries
+    solver = z3.SimpleSolver()
     solver.add(expr)
     if solver.check() == z3.sat:
       return model_to_dict(solver.model()) | val
     return None
 
+  def exact(self, val):
+    """
+    Reads Real values as Z3 does, so that 0.1 is exactly 1/10.
+    """
+    return {k: Fraction(str(v)) if isinstance(v, float) and self.gettypeof(k) == "Real" else v for k, v in val.items()}
+
+  def atommasks(self, val):
+    """
+    Evaluates the compiled atoms over a valuation. Returns the bitmask of
+    the atoms that hold and the bitmask of the atoms that could be evaluated.
+    """
+    val = self.exact(val)
+    mask = known = 0
+    for k, atom in self.atoms.items():
+      value = atom(val)
+      if value is not None:
+        known |= self.bits[k]
+        if value:
+          mask |= self.bits[k]
+    return mask, known
+
+  def candidates(self, node, mask, known):
+    """
+    Returns the edges of node that are not ruled out by the atom bitmasks,
+    with the value of their env and sys labels (None if unknown).
+    """
+    if node.name not in self.nodebits:
+      symbols = {s for e in node.edges for s in labelsymbols(e.envplay) + labelsymbols(e.sysplay)}
+      self.nodebits[node.name] = sum(self.bits[s] for s in symbols)
+    bits = self.nodebits[node.name]
+    key = (mask & known & bits, known & bits)
+    index = self.index.setdefault(node.name, {})
+    if key not in index:
+      values = {k: (bool(mask & b) if known & b else None) for k, b in self.bits.items() if bits & b}
+      labels = ((e, evallabel(e.envplay, values), evallabel(e.sysplay, values)) for e in node.edges)
+      index[key] = [(e, env, sys) for e, env, sys in labels if env is not False and sys is not False]
+    return index[key]
+
+  def choose(self, node, fullval, mask, known):
+    """
+    Returns the target of the first edge of node that fullval takes and a
+    model of it, or node and None if there is none. Z3 is only called for
+    the labels that cannot be decided from the bitmasks.
+    """
+    for edge, env, sys in self.candidates(node, mask, known):
+      if env and sys:
+        model = fullval
+      elif env:
+        model = self.models(fullval, edge.getSysResponse())
+      else:
+        model = self.models(fullval, z3.And(edge.getEnvPlay(), edge.getSysResponse()))
+      if model is not None:
+        return edge.outnode, model
+    return node, None
+
+  def respond(self, node, envval, prsysval):
+    """
+    Finds a valid response from node based on the environment and proposed
+    system values. Returns the next node and the response (None if there is
+    none). The shield itself is not modified, so it can be shared.
+    """
+    fullval = envval | prsysval
+    node, model = self.choose(node, fullval, *self.atommasks(fullval))
+    if model is None:
+      return node, None
+    assignedmodel = {k: v for k, v in model.items() if k in self.sysvars}
+    arbitraryvals = {v["name"]:getvalfor(v["type"]) for v in self.variables if v["owner"] == "system"}
+    return node, arbitraryvals | assignedmodel
+
   def protect(self, envval, prsysval):
     """
     Protects the system by finding a valid response based on the environment and proposed system values.
     """
-    fullval = envval | prsysval
-    sysvars = [v["name"] for v in self.variables if v["owner"] == "system"]
-    for edge in self.node.edges:
-      fullplay = z3.And(edge.getEnvPlay(), edge.getSysResponse())
-      model = self.models(fullval, fullplay)
-      if model is not None:
-        self.node = edge.outnode
-        assignedmodel = {k: v for k, v in model.items() if k in sysvars}
-        arbitraryvals = {v["name"]:getvalfor(v["type"]) for v in self.variables if v["owner"] == "system"}
-        return arbitraryvals | assignedmodel
-    return None
+    self.node, response = self.respond(self.node, envval, prsysval)
+    return response
+
+  def replay(self, columns, max_fetch_depth):
+    """
+    Runs the shield over a whole trace, given as a dict from variable names
+    to equally long arrays with the env values and the proposed sys values.
+    Returns the corrected sys columns and the indices of the steps whose
+    proposed response was not valid.
+    """
+    import numpy as np
+    missing = [v["name"] for v in self.variables if v["name"] not in columns]
+    if missing:
+      error("Missing columns in trace: " + ", ".join(missing))
+    columns = {v["name"]: np.asarray(columns[v["name"]]).astype(numpytype(v["type"])) for v in self.variables}
+    length = min(map(len, columns.values()), default=0)
+    masks, knowns = self.atomcolumns(columns, length, max_fetch_depth)
+    envvars = [v["name"] for v in self.variables if v["owner"] == "environment"]
+    outputs = {k: columns[k][:length].copy() for k in self.sysvars}
+    history = {k: columns[k] for k in envvars} | outputs
+    violations = []
+    stale = 0
+
+    for i in range(length):
+      # Until max_fetch_depth steps after a correction the fetched values
+      # are not the recorded ones, so the precomputed masks do not apply
+      if not stale:
+        candidates = self.candidates(self.node, int(masks[i]), int(knowns[i]))
+        if candidates and candidates[0][1] and candidates[0][2]:
+          self.node = candidates[0][0].outnode
+          continue
+      stale = max(stale - 1, 0)
+      fetched = {
+        fetchname(k, d): history[k][i - d].item()
+        for d in range(1, min(i, max_fetch_depth) + 1)
+        for k in history
+      }
+      envval = {k: columns[k][i].item() for k in envvars} | fetched
+      model = self.protect(envval, {k: columns[k][i].item() for k in self.sysvars})
+      if model is None:
+        violations.append(i)
+        model = self.protect(envval, {})
+        if model is None:
+          error("No valid response at step " + str(i))
+        for k in self.sysvars:
+          outputs[k][i] = model[k]
+        stale = max_fetch_depth
+    return outputs, violations
+
+  def atomcolumns(self, columns, length, max_fetch_depth):
+    """
+    Evaluates the atoms on every step of a trace at once, with the FETCH_
+    values as shifted columns. Returns the columns of atom bitmasks that
+    hold and that could be evaluated.
+    """
+    import numpy as np
+    shifted = dict(columns)
+    for d in range(1, max_fetch_depth + 1):
+      for k, column in columns.items():
+        shifted[fetchname(k, d)] = np.concatenate((np.zeros(d, column.dtype), column[:-d]))[:length]
+    dtype = np.uint64 if len(self.bits) <= 64 else object
+    masks = np.zeros(length, dtype)
+    knowns = np.zeros(length, dtype)
+    steps = np.arange(length)
+    for k, atom in self.atoms.items():
+      values = atom.evalcolumns(shifted, length)
+      known = steps >= max(map(fetchprefix, atom.variables), default=0)
+      if values is None:
+        values, known = self.atomsteps(atom, shifted, known)
+      bit = self.bits[k] if dtype is object else np.uint64(self.bits[k])
+      masks[values & known] |= bit
+      knowns[known] |= bit
+    return masks, knowns
+
+  def atomsteps(self, atom, columns, known):
+    """
+    Evaluates an atom without a NumPy form (like those over Reals) on each
+    step where known holds. Returns its values and the steps where it could
+    be evaluated.
+    """
+    import numpy as np
+    values = np.zeros(len(known), dtype=bool)
+    known = known & (atom.variables <= columns.keys())
+    for i in np.flatnonzero(known):
+      value = atom(self.exact({k: columns[k][i].item() for k in atom.variables}))
+      if value is None:
+        known[i] = False
+      else:
+        values[i] = value
+    return values, known
+
+def fetchname(nm, depth):
+  return "FETCH_" * depth + nm
+
+def fetchprefix(nm):
+  depth = 0
+  while nm.startswith("FETCH_"):
+    nm = nm[6:]
+    depth += 1
+  return depth
+
+def numpytype(ty):
+  import numpy as np
+  match ty:
+    case "Int":
+      return np.int64
+    case "Real":
+      return np.float64
+    case _:
+      error("Unhandled type: " + ty)
 
 def z3tycons(ty):
   match ty:
@@ -79,17 +262,17 @@ def getvalfor(ty):
 
 def read_mealy(mealy_fname):
   """
-  Reads a Mealy machine from a YAML file and constructs the Shield object.
+  Reads a Mealy machine from a YAML or binary file and constructs the Shield object.
   """
+  if ismealyfile(mealy_fname):
+    mealy = MealyFile(mealy_fname)
+    return Shield(mealy.nodes[0], mealy.variables, mealy.atoms()), mealy.maxfetchdepth, mealy.nodes
+
   with open(mealy_fname, "r") as f:
     mealy_data = yaml.safe_load(f.read())
 
   variables = mealy_data["variables"]
-  idregex = r"\b[a-zA-Z][a-zA-Z0-9_]*\b"
-  transtab = {
-    k: z32ltlt(parse_smt2_string(f"(assert {v})", decls=getz3vars(re.findall(idregex, v), variables))[0])
-    for k, v in mealy_data["transtab"].items()
-  }
+  transtab = readtranstab(mealy_data["transtab"], variables)
   mealynodes = mealy_data["nodes"]
   nodes = [Node(str(i)) for i in range(len(mealynodes))]
 
@@ -106,7 +289,7 @@ def read_mealy(mealy_fname):
       nodes[i].addEdge(edge)
 
   max_fetch_depth = max(fetchdepth(getZ3(v)) for v in transtab.values())
-  return Shield(nodes[0], variables), max_fetch_depth, nodes
+  return Shield(nodes[0], variables, compiletranstab(transtab)), max_fetch_depth, nodes
 
 
 def z3_val_to_python(val):
@@ -146,33 +329,149 @@ def parse_arguments():
   parser.add_argument('--mealy', help='File with Mealy machine', type=str, required=True)
   parser.add_argument('--show-mealy', action="store_true", help='Show mealy machine')
   parser.add_argument('--dbglevel', help='Debug level', type=int, default=0)
+  parser.add_argument('--convert', help='Write the Mealy machine to this file in the binary format and exit', type=str)
+  parser.add_argument('--serve', help='Serve one session per connection on host:port or unix:PATH instead of using stdin', type=str)
+  parser.add_argument('--replay', help='Replay a trace from a CSV or .npz file with one column per variable, printing the corrected sys columns as CSV', type=str)
   return parser.parse_args()
 
 
-def process_plays(shield, max_fetch_depth):
+class Session:
   """
-  Processes plays from standard input and applies the shield logic.
+  The state of one run of a shield: its current node and the last plays,
+  for the FETCH_ values. Many sessions can share a shield.
   """
-  plays = (json.loads(line) for line in sys.stdin)
-  prev_plays = deque(maxlen=max_fetch_depth)
+  def __init__(self, shield, max_fetch_depth):
+    self.shield = shield
+    self.node = shield.node
+    self.max_fetch_depth = max_fetch_depth
+    self.prev_plays = deque(maxlen=max_fetch_depth)
 
-  for env_play, sys_play in plays:
+  def step(self, env_play, sys_play):
+    """
+    Returns the response to a play and whether the proposed one was valid.
+    """
     fetched_past = {
       ("FETCH_" * (i + 1) + k): v
-      for i, kv in enumerate(reversed(prev_plays))
+      for i, kv in enumerate(reversed(self.prev_plays))
       for k, v in kv.items()
-      if keep_var(k, max_fetch_depth)
+      if keep_var(k, self.max_fetch_depth)
     }
     full_env = env_play | fetched_past
-    model = shield.protect(full_env, sys_play)
+    node, model = self.shield.respond(self.node, full_env, sys_play)
+    valid = model is not None
 
-    if model is None:
-      print("The proposed response was not valid", file=sys.stderr)
-      model = shield.protect(full_env, {})
+    if not valid:
+      node, model = self.shield.respond(self.node, full_env, {})
+      if model is None:
+        error("No valid response for the environment play " + json.dumps(env_play))
+
+    # Only now that the step went through does the session move
+    self.prev_plays.append(env_play | model)
+    self.node = node
+    return model, valid
 
+
+def process_plays(shield, max_fetch_depth):
+  """
+  Processes plays from standard input and applies the shield logic.
+  """
+  plays = (json.loads(line) for line in sys.stdin)
+  session = Session(shield, max_fetch_depth)
+
+  for env_play, sys_play in plays:
+    model, valid = session.step(env_play, sys_play)
+    if not valid:
+      print("The proposed response was not valid", file=sys.stderr)
     print(json.dumps(model))
-    full_play = env_play | model
-    prev_plays.append(full_play)
+
+
+async def serve_session(shield, max_fetch_depth, reader, writer):
+  """
+  Runs one session over a connection, with the protocol of stdin/stdout.
+  """
+  session = Session(shield, max_fetch_depth)
+  try:
+    while line := await reader.readline():
+      try:
+        env_play, sys_play = json.loads(line)
+        reply, _ = session.step(env_play, sys_play)
+      except Exception as e:
+        # A bad line only fails its own step, not the session
+        reply = {"error": str(e) or repr(e)}
+      writer.write((json.dumps(reply) + "\n").encode())
+      await writer.drain()
+      # Let the other sessions take a step before the next line of this one
+      await asyncio.sleep(0)
+  except ConnectionError:
+    pass
+  finally:
+    writer.close()
+
+
+def stale_socket(path):
+  """
+  Whether path is a socket, like one left by an earlier server, that can be
+  replaced. Other files at path are never removed.
+  """
+  try:
+    return stat.S_ISSOCK(os.lstat(path).st_mode)
+  except FileNotFoundError:
+    return False
+
+
+async def serve_sessions(shield, max_fetch_depth, address):
+  """
+  Serves sessions on host:port or unix:PATH until interrupted.
+  """
+  handler = functools.partial(serve_session, shield, max_fetch_depth)
+  if address.startswith("unix:"):
+    if stale_socket(address[5:]):
+      os.remove(address[5:])
+    elif os.path.lexists(address[5:]):
+      error(address[5:] + " exists and is not a socket")
+    server = await asyncio.start_unix_server(handler, address[5:], backlog=4096)
+  else:
+    host, _, port = address.rpartition(":")
+    server = await asyncio.start_server(handler, host or "127.0.0.1", int(port), backlog=4096)
+  stop = asyncio.Event()
+  asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+  print("Serving on " + address, flush=True)
+  async with server:
+    await stop.wait()
+
+
+def serve(shield, max_fetch_depth, address):
+  try:
+    asyncio.run(serve_sessions(shield, max_fetch_depth, address))
+  except KeyboardInterrupt:
+    pass
+  finally:
+    if address.startswith("unix:") and stale_socket(address[5:]):
+      os.remove(address[5:])
+
+
+def read_trace(fname):
+  """
+  Reads the columns of a trace from a CSV file with a header or a .npz file.
+  """
+  import numpy as np
+  if fname.endswith(".npz"):
+    with np.load(fname) as data:
+      return dict(data)
+  data = np.atleast_1d(np.genfromtxt(fname, delimiter=",", names=True, dtype=None, encoding=None))
+  return {k: data[k] for k in data.dtype.names}
+
+
+def replay_trace(shield, max_fetch_depth, fname):
+  """
+  Replays a recorded trace and prints the corrected sys columns as CSV.
+  """
+  outputs, violations = shield.replay(read_trace(fname), max_fetch_depth)
+  writer = csv.writer(sys.stdout)
+  writer.writerow(outputs.keys())
+  writer.writerows(zip(*(column.tolist() for column in outputs.values())))
+  if violations:
+    print("The proposed response was not valid at steps: " + " ".join(map(str, violations)), file=sys.stderr)
 
 
 def main():
@@ -181,11 +480,24 @@ def main():
   """
   args = parse_arguments()
   setdbglevel(args.dbglevel)
-  shield, max_fetch_depth, nodes = read_mealy(args.mealy)
-  if args.show_mealy:
-    print("Mealy machine:")
-    print(nodes2dot(nodes))
-  process_plays(shield, max_fetch_depth)
+  try:
+    if args.convert:
+      convertmealy(args.mealy, args.convert)
+      return
+    shield, max_fetch_depth, nodes = read_mealy(args.mealy)
+    if args.show_mealy:
+      print("Mealy machine:")
+      print(nodes2dot(nodes))
+    if args.replay:
+      replay_trace(shield, max_fetch_depth, args.replay)
+    elif args.serve:
+      serve(shield, max_fetch_depth, args.serve)
+    else:
+      process_plays(shield, max_fetch_depth)
+  except SyntheosError as e:
+    print("ERROR:")
+    print(e)
+    exit(-1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+from .config import CONFIG, newcontext, engine
+from .datatypes import *
+from .main import makeparser, configure, synthesize, mealydata
+from .specreader import readfromtext, readfromdict
+
+# In-process entry point. Every call runs in a context of its own (see
+# config.py), so calls can be made from several threads or asyncio tasks,
+# and errors are raised as SyntheosError (StrixError when Strix fails)
+# instead of ending the process. Calls share the Z3 state of the process and
+# its caches, and take turns to use them: what runs at the same time is the
+# waiting for Strix.
+#
+# spec is the YAML text of a specification or the mapping it loads to.
+# options are command line options of syntheos.py, either as a list of
+# arguments or as a mapping from their names (refinement_batch or
+# refinement-batch) to values.
+
+class Result:
+  def __init__(self, specdata, realizable, nodes, stats, calls):
+    self.specdata = specdata
+    self.name = specdata["name"]
+    self.realizable = realizable
+    self.nodes = nodes
+    self.stats = stats
+    self.calls = calls
+
+  @property
+  def verdict(self):
+    return "realizable" if self.realizable else "unrealizable"
+
+  def mealy(self):
+    # The controller, as written by --save-mealy
+    return mealydata(self.nodes, dict(self.specdata))
+
+  def __repr__(self):
+    return "Result(%r, %s, %d Strix calls)" % (self.name, self.verdict, len(self.calls))
+
+def optionsargv(parser, options):
+  # Command line arguments for options given as a mapping, so that they are
+  # checked and converted by the parser like any others
+  actions = {a.dest: a for a in parser._actions if a.option_strings}
+  argv = []
+  for name, value in options.items():
+    action = actions.get(name.lstrip("-").replace("-", "_"))
+    if action is None:
+      error("Unknown option: " + name)
+    option = action.option_strings[0]
+    if value is None:
+      continue
+    if action.nargs == 0:
+      if not isinstance(value, bool):
+        error("Option %s takes true or false, not %r" % (name, value))
+      if value:
+        argv.append(option)
+    elif isinstance(action, argparse._AppendAction):
+      argv.extend(option + "=" + str(v) for v in ([value] if isinstance(value, str) else value))
+    else:
+      argv.append(option + "=" + str(value))
+  return argv
+
+def makeargs(options):
+  parser = makeparser(raising=True)
+  if options is None or isinstance(options, dict):
+    options = optionsargv(parser, options or {})
+  return parser.parse_args([str(o) for o in options])
+
+def check_realizability(spec, options = None):
+  with newcontext():
+    args = makeargs(options)
+    with engine():
+      configure(args)
+      specdata = readfromtext(spec) if isinstance(spec, str) else readfromdict(spec)
+      boolizer, nodes = synthesize(specdata, args)
+    return Result(specdata, boolizer.realizable, nodes, CONFIG.reporter.stats, CONFIG.reporter.calls)
+
+async def check_realizability_async(spec, options = None):
+  return await asyncio.to_thread(check_realizability, spec, options)
@@ -0,0 +1,172 @@
+import math
+from fractions import Fraction
+from .datatypes import *
+from . import maybenotz3 as mnz3
+
+# Compiles the theory atoms of a controller into Python functions over a
+# valuation (a dict from variable names, FETCH_ ones included, to numbers),
+# so that a shield can tell which edges a valuation takes without Z3.
+# Atoms using something that is not handled here are not compiled, and
+# evaluating an atom over a valuation that lacks one of its variables gives
+# None: in both cases the shield falls back to Z3.
+#
+# Integer division and modulo follow SMT-LIB (the remainder is never
+# negative), and rational constants are Fractions, so comparisons are exact
+# when Real values are given as Fractions too.
+#
+# Atoms are also compiled to NumPy expressions over whole columns of values,
+# to evaluate them on every step of a trace at once. Only atoms without Real
+# terms are, as floats would not be exact, and division is only compiled by
+# nonzero constants.
+
+class Unsupported(Exception):
+  pass
+
+def smtdiv(a, b):
+  q = math.floor(Fraction(a) / b)
+  return q if b > 0 else -math.floor(Fraction(a) / -b)
+
+def smtmod(a, b):
+  return a - b * smtdiv(a, b)
+
+def realdiv(a, b):
+  return Fraction(a) / b if isinstance(a, int) and isinstance(b, int) else a / b
+
+RUNTIME = {"Fraction": Fraction, "smtdiv": smtdiv, "smtmod": smtmod, "realdiv": realdiv, "floor": math.floor}
+
+def vectorruntime():
+  import numpy as np
+  def smtdiv(a, b):
+    return np.floor_divide(a, b) if b > 0 else -np.floor_divide(a, -b)
+  def smtmod(a, b):
+    return a - b * smtdiv(a, b)
+  return {"np": np, "smtdiv": smtdiv, "smtmod": smtmod, "realdiv": np.true_divide, "floor": np.floor}
+
+NARY = {
+  mnz3.Z3_OP_ADD: " + ",
+  mnz3.Z3_OP_SUB: " - ",
+  mnz3.Z3_OP_MUL: " * ",
+  mnz3.Z3_OP_AND: " and ",
+  mnz3.Z3_OP_OR: " or ",
+}
+
+VECTORNARY = NARY | {
+  mnz3.Z3_OP_AND: " & ",
+  mnz3.Z3_OP_OR: " | ",
+}
+
+COMPARISONS = {
+  mnz3.Z3_OP_LE: " <= ",
+  mnz3.Z3_OP_LT: " < ",
+  mnz3.Z3_OP_GE: " >= ",
+  mnz3.Z3_OP_GT: " > ",
+  mnz3.Z3_OP_EQ: " == ",
+  mnz3.Z3_OP_DISTINCT: " != ",
+}
+
+def z32py(e, variables, vector=False):
+  # Python source for e; adds the names of its variables to variables.
+  # With vector, the source is a NumPy expression over columns
+  if vector and mnz3.is_real(e):
+    raise Unsupported("Real term " + str(e))
+  if mnz3.is_int_value(e):
+    return str(e.as_long())
+  if mnz3.is_rational_value(e):
+    return "Fraction(%d, %d)" % (e.numerator_as_long(), e.denominator_as_long())
+  if mnz3.is_true(e):
+    return "True"
+  if mnz3.is_false(e):
+    return "False"
+  if mnz3.isz3var(e):
+    name = e.decl().name()
+    variables.add(name)
+    return "v[%r]" % name
+  kind = e.decl().kind()
+  args = [z32py(c, variables, vector) for c in e.children()]
+  nary = VECTORNARY if vector else NARY
+  if kind in nary:
+    return "(" + nary[kind].join(args) + ")"
+  if kind in COMPARISONS and len(args) == 2:
+    return "(" + COMPARISONS[kind].join(args) + ")"
+  if kind == mnz3.Z3_OP_UMINUS:
+    return "(-" + args[0] + ")"
+  if kind == mnz3.Z3_OP_NOT:
+    return ("(~" if vector else "(not ") + args[0] + ")"
+  if kind == mnz3.Z3_OP_IMPLIES:
+    return ("((~" if vector else "((not ") + args[0] + ") " + ("| " if vector else "or ") + args[1] + ")"
+  if kind == mnz3.Z3_OP_ITE:
+    if vector:
+      return "np.where(" + ", ".join(args) + ")"
+    return "(" + args[1] + " if " + args[0] + " else " + args[2] + ")"
+  if kind in (mnz3.Z3_OP_DIV, mnz3.Z3_OP_IDIV, mnz3.Z3_OP_MOD):
+    divisor = e.children()[1]
+    if vector and not (mnz3.isz3const(divisor) and mnz3.is_true(mnz3.simplify(divisor != 0))):
+      raise Unsupported("division by " + str(divisor))
+    function = {mnz3.Z3_OP_DIV: "realdiv", mnz3.Z3_OP_IDIV: "smtdiv", mnz3.Z3_OP_MOD: "smtmod"}[kind]
+    return function + "(" + args[0] + ", " + args[1] + ")"
+  if kind == mnz3.Z3_OP_TO_REAL:
+    return args[0]
+  if kind == mnz3.Z3_OP_TO_INT:
+    return "floor(" + args[0] + ")"
+  raise Unsupported(e.decl().name())
+
+class CompiledAtom:
+  def __init__(self, source, vectorsource, variables):
+    self.source = source
+    self.vectorsource = vectorsource
+    self.variables = set(variables)
+    self.function = None if source is None else eval("lambda v: " + source, dict(RUNTIME))
+    self.vectorfunction = None
+
+  def __call__(self, valuation):
+    # True, False or None if it cannot be told without Z3
+    if self.function is None:
+      return None
+    try:
+      return bool(self.function(valuation))
+    except (KeyError, ZeroDivisionError):
+      return None
+
+  def evalcolumns(self, columns, length):
+    # Boolean array with the value of the atom on each step, or None if it
+    # cannot be evaluated on whole columns
+    if self.vectorsource is None or not self.variables <= columns.keys():
+      return None
+    if self.vectorfunction is None:
+      self.vectorfunction = eval("lambda v: " + self.vectorsource, vectorruntime())
+    import numpy as np
+    return np.broadcast_to(np.asarray(self.vectorfunction(columns), dtype=bool), (length,))
+
+def compileatom(atom):
+  variables = set()
+  try:
+    source = z32py(atom, variables)
+  except Unsupported as e:
+    dbg1("Not compiling " + str(atom) + ": unhandled " + str(e))
+    source = None
+  try:
+    vectorsource = z32py(atom, variables, vector=True)
+  except Unsupported:
+    vectorsource = None
+  return CompiledAtom(source, vectorsource, variables)
+
+def compiletranstab(transtab):
+  return {k: compileatom(ltlt2z3(v)) for k, v in transtab.items()}
+
+def evallabel(label, atomvalues):
+  # Kleene evaluation of an edge label over the values of its atoms,
+  # with None for unknown
+  if isBoolSym(label):
+    if isBoolSymTrue(label):
+      return True
+    if isBoolSymFalse(label):
+      return False
+    return atomvalues[symbol(label)]
+  values = [evallabel(op, atomvalues) for op in label.operators]
+  if label.kind == "!":
+    return None if values[0] is None else not values[0]
+  if label.kind == "&":
+    return False if False in values else (None if None in values else True)
+  if label.kind == "|":
+    return True if True in values else (None if None in values else False)
+  error("Unhandled case in label: " + label.kind)
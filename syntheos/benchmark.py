@@ -0,0 +1,177 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SYNTHEOS = str(ROOT / "syntheos.py")
+PHASES = ["strix", "z3", "sympy", "parsing"]
+# What a run imports before doing any work
+STARTUP = {
+  "python": "pass",
+  "syntheos": "import syntheos.main",
+  "shield": "import shield",
+}
+
+def readreport(reportdir):
+  roots = list(Path(reportdir).glob("*/root.txt"))
+  if not roots:
+    return None
+  lines = roots[0].read_text().splitlines()
+  calls = json.loads(lines[1]) if len(lines) > 1 else []
+  stats = json.loads(lines[2]) if len(lines) > 2 else {}
+  return calls, stats
+
+def stopgroup(proc):
+  # syntheos runs Strix in a session of its own, where killing the group of
+  # syntheos would not reach it: SIGTERM lets syntheos kill it first
+  try:
+    os.killpg(proc.pid, signal.SIGTERM)
+    proc.communicate(timeout=10)
+  except ProcessLookupError:
+    pass
+  except subprocess.TimeoutExpired:
+    os.killpg(proc.pid, signal.SIGKILL)
+    proc.communicate()
+
+def runspec(spec, args):
+  result = {"spec": spec, "status": "ok", "verdict": None, "wall": None,
+            "iterations": None, "literals": None, "strixwins": None}
+  result.update({phase: None for phase in PHASES})
+  with tempfile.TemporaryDirectory() as reportdir:
+    cmd = [sys.executable, SYNTHEOS, "--yaml", spec, "--reportdir", reportdir] + args.syntheos_args
+    if not args.use_caches:
+      cmd.append("--no-strixcache")
+    if not any(a.startswith("--strixmaxsecs") for a in args.syntheos_args):
+      cmd += ["--strixmaxsecs", str(args.timeout)]
+    starttime = time.time()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    try:
+      proc.communicate(timeout=args.timeout)
+      if proc.returncode != 0:
+        result["status"] = "error"
+    except subprocess.TimeoutExpired:
+      result["status"] = "timeout"
+      stopgroup(proc)
+    result["wall"] = round(time.time() - starttime, 2)
+    report = readreport(reportdir)
+  if report is not None:
+    calls, stats = report
+    result["iterations"] = len(calls)
+    result["verdict"] = stats.get("verdict")
+    result["literals"] = stats.get("literals")
+    result["strixwins"] = stats.get("strixwins")
+    phases = stats.get("phases", {})
+    result.update({phase: phases[phase]["seconds"] for phase in PHASES if phase in phases})
+  return result
+
+def startuptimes(runs):
+  # Median wall time of a fresh interpreter doing each import
+  times = {}
+  for name, stmt in STARTUP.items():
+    samples = []
+    for _ in range(runs):
+      starttime = time.perf_counter()
+      subprocess.run([sys.executable, "-c", stmt], cwd=ROOT, check=True)
+      samples.append(time.perf_counter() - starttime)
+    times[name] = round(sorted(samples)[len(samples) // 2], 3)
+  return times
+
+def checkstartup(args):
+  times = startuptimes(args.startup)
+  overbudget = []
+  for name, seconds in times.items():
+    print("%-10s %6.3fs" % (name, seconds))
+    if args.startup_budget is not None and seconds > args.startup_budget:
+      overbudget.append(name)
+  if args.json is not None:
+    with open(args.json, "w") as f:
+      json.dump(times, f, indent=1)
+  for name in overbudget:
+    print("OVER BUDGET %s: %.3fs (budget %.3fs)" % (name, times[name], args.startup_budget))
+  if overbudget:
+    sys.exit(1)
+
+def compare(results, baseline, args):
+  regressions = []
+  base = {r["spec"]: r for r in baseline}
+  for r in results:
+    b = base.get(r["spec"])
+    if b is None:
+      continue
+    if b["status"] == "ok" and r["status"] != "ok":
+      regressions.append((r["spec"], "status %s (was ok)" % r["status"]))
+      continue
+    if b["verdict"] is not None and r["verdict"] != b["verdict"]:
+      regressions.append((r["spec"], "verdict %s (was %s)" % (r["verdict"], b["verdict"])))
+    if b["iterations"] is not None and r["iterations"] is not None and r["iterations"] > b["iterations"]:
+      regressions.append((r["spec"], "%d CEGAR iterations (was %d)" % (r["iterations"], b["iterations"])))
+    if b["wall"] is not None and r["wall"] is not None and \
+       r["wall"] > b["wall"] * (1 + args.time_tolerance) and r["wall"] - b["wall"] > args.min_seconds:
+      regressions.append((r["spec"], "%.2fs (was %.2fs)" % (r["wall"], b["wall"])))
+  return regressions
+
+def writecsv(fname, results):
+  with open(fname, "w", newline="") as f:
+    writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+    writer.writeheader()
+    writer.writerows(results)
+
+def parse_arguments():
+  parser = argparse.ArgumentParser(description="Run syntheos over a corpus of specifications")
+  parser.add_argument('specs', nargs="*", default=["specs/**/*.yaml"], help='Globs of YAML specifications')
+  parser.add_argument('--jobs', help='Specifications run in parallel', type=int, default=1)
+  parser.add_argument('--timeout', help='Seconds per specification', type=int, default=600)
+  parser.add_argument('--json', help='Write the results as JSON', type=str, default=None)
+  parser.add_argument('--csv', help='Write the results as CSV', type=str, default=None)
+  parser.add_argument('--baseline', help='JSON results to compare against', type=str, default=None)
+  parser.add_argument('--time-tolerance', help='Relative slowdown flagged as a regression', type=float, default=0.25)
+  parser.add_argument('--min-seconds', help='Slowdowns below this many seconds are ignored', type=float, default=1.0)
+  parser.add_argument('--use-caches', action="store_true", help='Let syntheos use its Strix cache')
+  parser.add_argument('--syntheos-args', help='Extra arguments for syntheos.py', type=str, default="")
+  parser.add_argument('--startup', help='Only time the imports of syntheos and shield, taking the median of this many runs', type=int, default=0)
+  parser.add_argument('--startup-budget', help='Seconds of startup flagged as a regression', type=float, default=None)
+  args = parser.parse_args()
+  args.syntheos_args = args.syntheos_args.split()
+  return args
+
+def main():
+  args = parse_arguments()
+  if args.startup > 0:
+    checkstartup(args)
+    return
+  specs = sorted({spec for pattern in args.specs for spec in glob.glob(pattern, recursive=True)})
+  if not specs:
+    print("No specifications found")
+    sys.exit(1)
+  with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+    results = []
+    for r in executor.map(lambda spec: runspec(spec, args), specs):
+      print("%-70s %-8s %-13s %8s %4s" % (r["spec"], r["status"], r["verdict"], r["wall"], r["iterations"]))
+      results.append(r)
+  wins = Counter()
+  for r in results:
+    wins.update(r["strixwins"] or {})
+  if wins:
+    print("Strix portfolio wins: " + ", ".join("%s: %d" % win for win in wins.most_common()))
+  if args.json is not None:
+    with open(args.json, "w") as f:
+      json.dump(results, f, indent=1)
+  if args.csv is not None:
+    writecsv(args.csv, results)
+  if args.baseline is not None:
+    with open(args.baseline) as f:
+      regressions = compare(results, json.load(f), args)
+    for spec, why in regressions:
+      print("REGRESSION %s: %s" % (spec, why))
+    if regressions:
+      sys.exit(1)
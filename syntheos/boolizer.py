@@ -2,7 +2,7 @@ from .datatypes import *
 # from .maybenotz3 import *
 from . import maybenotz3 as mnz3
 from functools import reduce
-import copy
+from .knowledge import Knowledge
 
 def copy_and_fetch(var):
   return mnz3.copy_and_rename(var, lambda x : "FETCH_" + x)
@@ -22,12 +22,18 @@ def makeconj(l):
 
 class Booleanizer:
   def __init__(self, variables):
+    self.variables = variables
     self.sysvars = [v["name"] for v in variables if v["owner"] == "system"]
     self.littable = {}
+    # Z3 hash-conses terms, so the id of a live atom identifies it
+    # structurally; littable keeps every indexed atom alive.
+    self.litindex = {}
     self.guarantees = []
     self.assumptions = []
     self.fetchtautos = []
+    self.fetchtautopairs = set()
     self.booltautos = []
+    self.knowledge = Knowledge()
     self.formula = None
     self.realizable = None
 
@@ -42,7 +48,9 @@ class Booleanizer:
       f = getZ3(formula)
       if mnz3.is_true(f):
         return
-    self.booltautos.append(self.boolize(formula))
+    booltauto = self.boolize(formula)
+    self.booltautos.append(booltauto)
+    self.knowledge.add(ltl2z3bool(booltauto))
     z3form = ltlt2z3(formula)
     z3vars = z3getvars(z3form)
     forallformula = mnz3.make_forall(z3vars, z3form)
@@ -77,9 +85,7 @@ class Booleanizer:
       error("Bool symbol in full expression: " + str(formula))
     if isZ3(formula):
       return self.getliteral(getZ3(formula))
-    ret = copy.deepcopy(formula)
-    ret["operators"] = list(map(lambda f: self.boolize(f), ret["operators"]))
-    return ret
+    return createLTLExpr(formula.kind, [self.boolize(f) for f in formula.operators])
 
   def literalexists(self,th):
     return self.mgetliteral(th) is not None
@@ -87,9 +93,9 @@ class Booleanizer:
   def mgetliteral(self,th):
     assert not mnz3.is_true(th)
     assert not mnz3.is_false(th)
-    for l,[f,_] in self.littable.items():
-      if th==f:
-        return ltlBoolSym(l)
+    l = self.litindex.get(th.get_id())
+    if l is not None:
+      return ltlBoolSym(l)
 
   def getliteral(self,th):
     mliteral = self.mgetliteral(th)
@@ -98,6 +104,7 @@ class Booleanizer:
     newlid = "l"+str(len(self.littable))
     kind = LITTY.SYS if self.containssysvars(th) else LITTY.ENV
     self.littable[newlid] = [th,kind]
+    self.litindex[th.get_id()] = newlid
     return ltlBoolSym(newlid)
 
   def tautoExists(self, formula):
@@ -106,8 +113,7 @@ class Booleanizer:
     mfliteral = self.mgetliteral(fetchformula)
     if mliteral is None or mfliteral is None:
       return False
-    tauto = ltlG(ltlIff(mliteral,ltlX(mfliteral)))
-    return tauto in self.fetchtautos
+    return (symbol(mliteral), symbol(mfliteral)) in self.fetchtautopairs
 
   def createTauto(self, formula):
     fetchformula = mapfetch(formula)
@@ -121,7 +127,14 @@ class Booleanizer:
     return [l for l in getliterals(z32ltlt(formula)) if not self.tautoExists(l)]
 
   def createtmpassumptionfor(self, th):
-    self.fetchtautos.append(self.createTauto(th))
+    tauto = self.createTauto(th)
+    self.fetchtautopairs.add(self.fetchtautopair(tauto))
+    self.fetchtautos.append(tauto)
+
+  def fetchtautopair(self, tauto):
+    # G(l <-> X(fl)) as (l, fl)
+    iff = tauto.operators[0]
+    return (symbol(iff.operators[0]), symbol(iff.operators[1].operators[0]))
 
   def getboolformula(self):
     assumption = makeconj(self.assumptions)
@@ -1,67 +1,51 @@
-import ply.lex as lex
-import ply.yacc as yacc
+import re
+from functools import lru_cache
 from .datatypes import *
 
-tokens = (
-    'NUMBER',
-)
-
-literals = ['|', '!', '&', '(', ')']
-
-# Tokens
-
-def t_NUMBER(t):
-    r'\d+|t|f'
-    t.value = ltlBoolSym(t.value)
-    return t
-
-t_ignore = " "
-
-def t_error(t):
-    error("Illegal character '%s'" % t.value[0])
-    t.lexer.skip(1)
-
-lexer = lex.lex()
-
-# Parsing rules
-
-precedence = (
-    ('left', '|'),
-    ('left', '&'),
-    ('right', 'UMINUS'),
-)
-
-def p_statement_expr(p):
-    'statement : expression'
-    p[0]=p[1]
-
-def p_expression_binop(p):
-    '''expression : expression '|' expression
-                  | expression '&' expression'''
-    if p[2] == '|':
-        p[0] = ltlDisj(p[1], p[3])
-    elif p[2] == '&':
-        p[0] = ltlConj(p[1], p[3])
-
-def p_expression_uminus(p):
-    "expression : '!' expression %prec UMINUS"
-    p[0] = ltlNeg(p[2])
-
-def p_expression_group(p):
-    "expression : '(' expression ')'"
-    p[0] = p[2]
-
-def p_expression_number(p):
-    "expression : NUMBER"
-    p[0] = p[1]
-
-def p_error(p):
-    if p:
-        print("Syntax error at '%s'" % p.value)
-    else:
-        print("Syntax error at EOF")
-
-parser = yacc.yacc(debug=0)
-
+# Parser for the labels of HOA edges: numbers (APs), t, f, !, &, | and
+# parentheses, with the usual precedences and & and | associating to the
+# left. Labels repeat a lot within a controller and across iterations,
+# and the expressions are immutable, so they are memoized by their text.
+
+tokenregex = re.compile(r"\d+|[tf!&|()]|\S")
+
+def syntaxerror(tokens, pos, s):
+  error("Syntax error at '%s' in label %s" % (tokens[pos] if pos < len(tokens) else "EOF", s))
+
+def parsedisj(tokens, pos, s):
+  e, pos = parseconj(tokens, pos, s)
+  while pos < len(tokens) and tokens[pos] == "|":
+    f, pos = parseconj(tokens, pos + 1, s)
+    e = ltlDisj(e, f)
+  return e, pos
+
+def parseconj(tokens, pos, s):
+  e, pos = parseunary(tokens, pos, s)
+  while pos < len(tokens) and tokens[pos] == "&":
+    f, pos = parseunary(tokens, pos + 1, s)
+    e = ltlConj(e, f)
+  return e, pos
+
+def parseunary(tokens, pos, s):
+  if pos >= len(tokens):
+    syntaxerror(tokens, pos, s)
+  tok = tokens[pos]
+  if tok == "!":
+    e, pos = parseunary(tokens, pos + 1, s)
+    return ltlNeg(e), pos
+  if tok == "(":
+    e, pos = parsedisj(tokens, pos + 1, s)
+    if pos >= len(tokens) or tokens[pos] != ")":
+      syntaxerror(tokens, pos, s)
+    return e, pos + 1
+  if tok.isdigit() or tok == "t" or tok == "f":
+    return ltlBoolSym(tok), pos + 1
+  syntaxerror(tokens, pos, s)
+
+@lru_cache(maxsize=1 << 16)
 def boolparse(s):
-  return parser.parse(s, lexer=lexer)
+  tokens = tokenregex.findall(s)
+  e, pos = parsedisj(tokens, 0, s)
+  if pos < len(tokens):
+    syntaxerror(tokens, pos, s)
+  return e
@@ -1,3 +1,71 @@
+import contextvars
+import threading
+from contextlib import contextmanager
 from types import SimpleNamespace
 
-CONFIG = SimpleNamespace()
+# The options and state of the check being run (its reporter, timers, debug
+# level, ...) live in a namespace held by a context variable, and CONFIG
+# reads and writes the attributes of the current one. A check started with
+# newcontext() gets a namespace of its own, so checks in different threads
+# or asyncio tasks do not see each other's state.
+#
+# The Z3 context, the query cache and the theory solver are shared by all
+# the checks of a process. ENGINE serializes the checks run through the API
+# while they use them; released() lets the others go on while a check only
+# waits, like for Strix.
+
+current = contextvars.ContextVar("syntheosconfig", default=None)
+
+class Config:
+  def namespace(self):
+    ns = current.get()
+    if ns is None:
+      ns = SimpleNamespace()
+      current.set(ns)
+    return ns
+
+  def __getattr__(self, name):
+    return getattr(self.namespace(), name)
+
+  def __setattr__(self, name, value):
+    setattr(self.namespace(), name, value)
+
+  def setdefault(self, name, make):
+    ns = self.namespace()
+    if not hasattr(ns, name):
+      setattr(ns, name, make())
+    return getattr(ns, name)
+
+CONFIG = Config()
+
+@contextmanager
+def newcontext():
+  token = current.set(SimpleNamespace())
+  try:
+    yield
+  finally:
+    current.reset(token)
+
+ENGINE = threading.Lock()
+
+@contextmanager
+def engine():
+  with ENGINE:
+    CONFIG.holdsengine = True
+    try:
+      yield
+    finally:
+      CONFIG.holdsengine = False
+
+@contextmanager
+def released():
+  if not CONFIG.setdefault("holdsengine", lambda: False):
+    yield
+    return
+  ENGINE.release()
+  CONFIG.holdsengine = False
+  try:
+    yield
+  finally:
+    ENGINE.acquire()
+    CONFIG.holdsengine = True
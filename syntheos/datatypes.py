@@ -1,16 +1,15 @@
 from enum import Enum,auto
 import traceback
 import sys
-import sympy
 from functools import reduce
 import re
 from . import maybenotz3 as mnz3
-import copy
+import threading
+import weakref
+from .config import CONFIG
 
-dbglevel = 0
 def setdbglevel(n):
-  global dbglevel
-  dbglevel = n
+  CONFIG.dbglevel = n
 
 def dbg1(s):
   dbg(s,1)
@@ -19,7 +18,7 @@ def dbg2(s):
 def dbg3(s):
   dbg(s,3)
 def dbg(s,i):
-  if dbglevel>=i:
+  if CONFIG.setdefault("dbglevel", lambda: 0)>=i:
     msg = s
     if callable(s):
       s()
@@ -35,11 +34,11 @@ class LITTY(Enum):
   SYS = auto()
   ENV = auto()
 
+class SyntheosError(Exception):
+  pass
+
 def error(s):
-  traceback.print_stack() 
-  print("ERROR:")
-  print(s)
-  exit(-1)
+  raise SyntheosError(str(s))
 
 def fetchdepth(lit):
   if mnz3.isz3var(lit):
@@ -60,9 +59,27 @@ def replaceliterals(formula, transtab):
     return transtab[symbol(formula)]
   if isZ3(formula):
     error("Theory element while replacing literals")
-  ret = copy.deepcopy(formula)
-  ret["operators"] = list(map(lambda f: replaceliterals(f, transtab), ret["operators"]))
-  return ret
+  return createLTLExpr(formula.kind, [replaceliterals(f, transtab) for f in formula.operators])
+
+def getcube(formula):
+  # The literals of a conjunction of (negated) symbols, None for anything else
+  if isBoolSymTrue(formula):
+    return []
+  if isBoolSymFalse(formula):
+    return None
+  if isBoolSym(formula):
+    return [(symbol(formula), True)]
+  if formula.kind == "!":
+    f = formula.operators[0]
+    if isBoolSym(f) and not isBoolSymTrue(f) and not isBoolSymFalse(f):
+      return [(symbol(f), False)]
+    return None
+  if formula.kind == "&":
+    cubes = [getcube(f) for f in formula.operators]
+    if any(c is None for c in cubes):
+      return None
+    return [l for c in cubes for l in c]
+  return None
 
 def isconstant(v):
   return v.lstrip("-").isdigit();
@@ -85,18 +102,18 @@ def ltlt2str(f):
     return symbol(f)
   if isZ3(f):
     return "[" + mnz3.z32str(getZ3(f)) + "]"
-  if len(f["operators"]) == 1:
-    return f["kind"] + "(" + ltlt2str(f["operators"][0]) + ")"
-  if len(f["operators"]) == 2:
-    return "(" + ltlt2str(f["operators"][0]) + " " + f["kind"] + " " + ltlt2str(f["operators"][1]) + ")"
+  if len(f.operators) == 1:
+    return f.kind + "(" + ltlt2str(f.operators[0]) + ")"
+  if len(f.operators) == 2:
+    return "(" + ltlt2str(f.operators[0]) + " " + f.kind + " " + ltlt2str(f.operators[1]) + ")"
 
 def symbol(l):
   assert isBoolSym(l)
-  return l["operators"][0]
+  return l.operators[0]
 
 def getZ3(l):
   assert isZ3(l)
-  return l["operators"][0]
+  return l.operators[0]
 
 def ltlt2z3(f):
   if isBoolSym(f):
@@ -106,7 +123,7 @@ def ltlt2z3(f):
       return mnz3.BoolVal(False)
     error("Non constant bool symbol converting to z3")
   if isZ3(f):
-    th = f["operators"][0]
+    th = f.operators[0]
     newexpr = z32ltlt(getZ3(f))
     if isZ3(newexpr):
       return getZ3(newexpr)
@@ -116,7 +133,7 @@ def ltlt2z3(f):
       "&": mnz3.And,
       "|": mnz3.Or,
   }
-  return z3funs[f["kind"]](*(list(map(ltlt2z3, f["operators"]))))
+  return z3funs[f.kind](*(list(map(ltlt2z3, f.operators))))
 
 def getliterals(formula):
   if isBoolSymTrue(formula) or isBoolSymFalse(formula):
@@ -125,10 +142,10 @@ def getliterals(formula):
     error("Bool symbol in full expression: " + str(e))
   if isZ3(formula):
     return [getZ3(formula)]
-  return reduce(lambda x,y: x + getliterals(y), formula["operators"], [])
+  return reduce(lambda x,y: x + getliterals(y), formula.operators, [])
 
 def isBoolSym(formula):
-  return formula["kind"] == "BOOLSYM"
+  return formula.kind == "BOOLSYM"
 
 def isBoolSymTrue(formula):
   return isBoolSym(formula) and symbol(formula) == "t"
@@ -137,21 +154,61 @@ def isBoolSymFalse(formula):
   return isBoolSym(formula) and symbol(formula) == "f"
 
 def isZ3(formula):
-  return formula["kind"] == "Z3"
+  return formula.kind == "Z3"
+
+def operatorkey(op):
+  if isinstance(op, LTLExpr):
+    return id(op)
+  if isinstance(op, str):
+    return op
+  return ("Z3", op.get_id())
+
+class LTLExpr:
+  # Formulas are hash-consed: there is a single live node per structure, so
+  # equality is identity and rewriting a formula only allocates the nodes
+  # above the operators that actually change.
+  __slots__ = ("kind", "operators", "__weakref__")
+  interned = weakref.WeakValueDictionary()
+  internlock = threading.Lock()
+
+  def __new__(cls, kind, operators):
+    operators = tuple(operators)
+    # A node keeps its operators alive, so their ids stay valid in the key
+    key = (kind,) + tuple(map(operatorkey, operators))
+    with cls.internlock:
+      node = cls.interned.get(key)
+      if node is None:
+        node = object.__new__(cls)
+        object.__setattr__(node, "kind", kind)
+        object.__setattr__(node, "operators", operators)
+        cls.interned[key] = node
+    return node
 
-def ltl2sympy(formula):
+  def __setattr__(self, name, value):
+    raise AttributeError("LTL expressions are immutable")
+
+  def __reduce__(self):
+    return (LTLExpr, (self.kind, self.operators))
+
+  def __repr__(self):
+    return "LTLExpr(%r, %r)" % (self.kind, list(self.operators))
+
+def ltl2z3bool(formula):
+  if isBoolSymTrue(formula):
+    return mnz3.BoolVal(True)
+  if isBoolSymFalse(formula):
+    return mnz3.BoolVal(False)
   if isBoolSym(formula):
-    sym = symbol(formula)
-    return sympy.Symbol(sym)
-  sympyfuns = {
-      "!": sympy.Not,
-      "&": sympy.And,
-      "|": sympy.Or,
+    return mnz3.Bool(symbol(formula))
+  z3funs = {
+      "!": mnz3.Not,
+      "&": mnz3.And,
+      "|": mnz3.Or,
   }
-  return sympyfuns[formula["kind"]](*(list(map(ltl2sympy, formula["operators"]))))
+  return z3funs[formula.kind](*(list(map(ltl2z3bool, formula.operators))))
 
 def createLTLExpr(k, op):
-  return {"kind": k, "operators": op}
+  return LTLExpr(k, op)
 
 def ltlConj(a,b):
   return createLTLExpr("&", [a,b])
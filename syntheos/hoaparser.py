@@ -2,6 +2,8 @@ from .boolparser import boolparse
 from .datatypes import *
 from io import StringIO
 from . import maybenotz3 as mnz3
+import re
+from .timers import timed
 
 def simply(cond, transtab):
   return ltlt2z3(replaceliterals(cond, transtab))
@@ -21,11 +23,24 @@ class Edge:
       self.envplayz3 = simply(self.envplay, self.transtab)
     return self.envplayz3
 
+  def getEnvCube(self):
+    cube = getcube(self.envplay)
+    if cube is None:
+      return None
+    return [(ltlt2z3(self.transtab[sym]), polarity) for sym, polarity in cube]
+
   def getSysResponse(self):
     if self.sysplayz3 is None:
       self.sysplayz3 = simply(self.sysplay, self.transtab)
     return self.sysplayz3
 
+def readatom(sexpr, variables):
+  idregex = r"\b[a-zA-Z][a-zA-Z0-9_]*\b"
+  return z32ltlt(mnz3.parse_smt2_string(f"(assert {sexpr})", decls=getz3vars(re.findall(idregex, sexpr), variables))[0])
+
+def readtranstab(sexprs, variables):
+  return {k: readatom(v, variables) for k, v in sexprs.items()}
+
 class Node:
   def __init__(self, name):
     self.edges = []
@@ -56,7 +71,7 @@ def parseprefix(txtstrm, littable):
 def processEdge(line, currentnode, nodes, transtab):
   condstr,outnodestr = line[1:].split("] ")
   outnoden = int(outnodestr)
-  plays = boolparse(condstr)["operators"]
+  plays = boolparse(condstr).operators
   e = Edge(plays[0], plays[1], nodes[outnoden], outnoden, transtab)
   nodes[currentnode].addEdge(e)
 
@@ -73,12 +88,16 @@ def nodes2dot(nodes):
   ret += "}"
   return ret
 
+@timed("parsing", "parsehoa")
 def parsehoa(txt, littable):
-  txtstrm = StringIO(txt)
-  nodenumber, startnode, realizable, transtab = parseprefix(txtstrm, littable)
+  return readhoa(StringIO(txt), littable)
+
+def readhoa(lines, littable):
+  # lines can be any iterable of lines, like the stdout of a running Strix
+  nodenumber, startnode, realizable, transtab = parseprefix(lines, littable)
   assert(startnode == 0)
   nodes = [Node(str(i)) for i in range(nodenumber)]
-  for line in txtstrm:
+  for line in lines:
     line = line.rstrip()
     if line.startswith("State: "):
       line = line[7:]
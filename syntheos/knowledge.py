@@ -0,0 +1,85 @@
+from . import maybenotz3 as mnz3
+from .datatypes import *
+from .timers import timed
+
+# The boolean tautologies learnt so far, kept in one incremental SAT
+# instance (Z3's propositional core) over the literals of the Booleanizer.
+# A clause is new knowledge if its negation is consistent with them, which
+# for a clause of literals is a check under the negated literals as
+# assumptions: nothing is added to the solver per candidate.
+#
+# newclause finds such a clause in the CNF of a formula without
+# distributing it: a model of the knowledge that falsifies the formula
+# falsifies some clause of its CNF, and that clause can be read off the
+# formula in a single pass.
+
+def isliteral(e):
+  return mnz3.is_const(e) or (mnz3.is_not(e) and mnz3.is_const(e.arg(0)))
+
+def negateliteral(e):
+  return e.arg(0) if mnz3.is_not(e) else mnz3.Not(e)
+
+def falsifiedclause(formula, polarity, value):
+  # The smallest clause of the CNF of formula (of its negation if not
+  # polarity) that value falsifies, or None if value satisfies it
+  if isBoolSymTrue(formula) or isBoolSymFalse(formula):
+    return None if isBoolSymTrue(formula) == polarity else []
+  if isBoolSym(formula):
+    if value(symbol(formula)) == polarity:
+      return None
+    return [formula if polarity else ltlNeg(formula)]
+  if formula.kind == "!":
+    return falsifiedclause(formula.operators[0], not polarity, value)
+  if formula.kind not in ["&", "|"]:
+    error("Unhandled case in clause search: " + formula.kind)
+  clauses = [falsifiedclause(f, polarity, value) for f in formula.operators]
+  if (formula.kind == "&") == polarity:
+    falsified = [c for c in clauses if c is not None]
+    return min(falsified, key=len) if falsified else None
+  if any(c is None for c in clauses):
+    return None
+  return list(dict.fromkeys(l for c in clauses for l in c))
+
+class Knowledge:
+  def __init__(self):
+    self.solver = mnz3.Solver()
+
+  def add(self, z3formula):
+    self.solver.add(z3formula)
+
+  @timed("z3")
+  def newclause(self, formula):
+    # A clause of the CNF of formula that is new knowledge, as a list of
+    # literals, or None if the knowledge already implies formula
+    self.solver.push()
+    self.solver.add(mnz3.Not(ltl2z3bool(formula)))
+    satres = self.solver.check()
+    model = self.solver.model() if satres == mnz3.sat else None
+    self.solver.pop()
+    if model is None:
+      return None
+    value = lambda l: mnz3.is_true(model.eval(mnz3.Bool(l), model_completion=True))
+    return falsifiedclause(formula, True, value)
+
+  @timed("z3")
+  def excludes(self, formula):
+    # Whether formula is inconsistent with the knowledge
+    cube = getcube(formula)
+    if cube is not None:
+      return self.solver.check(*[mnz3.Bool(l) if pol else mnz3.Not(mnz3.Bool(l)) for l, pol in cube]) == mnz3.unsat
+    self.solver.push()
+    self.solver.add(ltl2z3bool(formula))
+    satres = self.solver.check()
+    self.solver.pop()
+    return satres == mnz3.unsat
+
+  @timed("z3")
+  def isnew(self, clause):
+    lits = clause.children() if mnz3.is_or(clause) else [clause]
+    if all(isliteral(l) and not mnz3.is_true(l) and not mnz3.is_false(l) for l in lits):
+      return self.solver.check(*map(negateliteral, lits)) == mnz3.sat
+    self.solver.push()
+    self.solver.add(mnz3.Not(clause))
+    satres = self.solver.check()
+    self.solver.pop()
+    return satres == mnz3.sat
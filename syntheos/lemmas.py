@@ -0,0 +1,69 @@
+from itertools import combinations, product
+from functools import reduce
+from .config import CONFIG
+from .datatypes import *
+from . import maybenotz3 as mnz3
+from .parallel import parallelcubes
+from .timers import timed
+
+# Eager theory lemmas: before the first Strix call, look for small
+# conjunctions of literals (up to k of them) that are infeasible in the
+# theory and add their negation as a tautology, instead of waiting for
+# Strix to produce an edge that uses them. Only atoms that share variables
+# are combined, and cubes that contain an infeasible smaller cube are
+# skipped, so every lemma is minimal.
+
+def atomvars(atom):
+  return {v.decl().name() for v in z3getvars(atom)}
+
+def connected(varsets):
+  reached = set(varsets[0])
+  pending = list(varsets[1:])
+  while pending:
+    linked = [vs for vs in pending if vs & reached]
+    if not linked:
+      return False
+    for vs in linked:
+      reached |= vs
+      pending.remove(vs)
+  return True
+
+def candidatecubes(names, varsets, size, found):
+  for combo in combinations(range(len(names)), size):
+    if not connected([varsets[i] for i in combo]):
+      continue
+    for polarities in product([True, False], repeat=size):
+      cube = tuple((names[i], p) for i, p in zip(combo, polarities))
+      if not any(f <= set(cube) for f in found):
+        yield cube
+
+def iscubeunsat(boolizer, cube):
+  return not mnz3.isSatCube([(boolizer.littable[l][0], p) for l, p in cube])
+
+def infeasiblecubes(boolizer, k):
+  names = [l for l, [atom, _] in boolizer.littable.items() if mnz3.theorysolver.accepts(atom)]
+  varsets = [atomvars(boolizer.littable[l][0]) for l in names]
+  found = []
+  for size in range(1, k + 1):
+    cubes = list(candidatecubes(names, varsets, size, found))
+    if CONFIG.jobs > 1:
+      unsats = parallelcubes(cubes, boolizer)
+    else:
+      unsats = [iscubeunsat(boolizer, cube) for cube in cubes]
+    dbg1(f"Checked {len(cubes)} cubes of {size} literals")
+    found.extend(set(cube) for cube, unsat in zip(cubes, unsats) if unsat)
+  return found
+
+def cubelemma(boolizer, cube):
+  return reduce(ltlDisj, [ltlNeg(ltlZ3(boolizer.littable[l][0])) if p else ltlZ3(boolizer.littable[l][0])
+                          for l, p in sorted(cube, key=lambda lp: int(lp[0][1:]))])
+
+@timed("eagerlemmas")
+def addeagerlemmas(boolizer, k):
+  cubes = infeasiblecubes(boolizer, k)
+  dbg1(f"Adding {len(cubes)} eager theory lemmas")
+  for cube in cubes:
+    lemma = cubelemma(boolizer, cube)
+    dbg2(ltlt2str(lemma))
+    boolizer.addTauto(lemma)
+  return len(cubes)
@@ -0,0 +1,10 @@
+# ltltlextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('AND', 'BIDIRECTIONAL', 'F', 'G', 'IMPLIES', 'LPAREN', 'NEG', 'OR', 'R', 'RPAREN', 'STRING', 'W', 'X'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_STRING>\\[[^\\]]*\\])|(?P<t_BIDIRECTIONAL><->)|(?P<t_IMPLIES>->)|(?P<t_OR>\\|)|(?P<t_LPAREN>\\()|(?P<t_RPAREN>\\))|(?P<t_NEG>!)|(?P<t_F>F)|(?P<t_G>G)|(?P<t_X>X)|(?P<t_W>W)|(?P<t_R>R)|(?P<t_AND>&)', [None, (None, 'STRING'), (None, 'BIDIRECTIONAL'), (None, 'IMPLIES'), (None, 'OR'), (None, 'LPAREN'), (None, 'RPAREN'), (None, 'NEG'), (None, 'F'), (None, 'G'), (None, 'X'), (None, 'W'), (None, 'R'), (None, 'AND')])]}
+_lexstateignore = {'INITIAL': ' \t\n'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
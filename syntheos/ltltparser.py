@@ -1,6 +1,8 @@
 import ply.lex as lex
 import ply.yacc as yacc
+import threading
 from .datatypes import *
+from .timers import timed
 
 varstable = None
 
@@ -41,8 +43,11 @@ def t_error(t):
     error(f"Illegal character '{t.value[0]}'")
     t.lexer.skip(1)
 
-# Build the lexer
-lexer = lex.lex()
+# Build the lexer. The lexer and parser tables are shipped in
+# ltltlextab.py and ltltparsetab.py, so that startup does not validate the
+# grammar or regenerate them. The lexer table is loaded without checking it
+# against the rules above: delete ltltlextab.py after changing them.
+lexer = lex.lex(optimize=1, lextab="ltltlextab")
 
 # Precedence rules (higher precedence goes first)
 precedence = (
@@ -58,7 +63,7 @@ def p_expression_unary(p):
                   | G expression
                   | X expression
                   | NEG expression'''
-    p[0] = {"kind": p[1], "operators": [p[2]]}  # (operator, operand list)
+    p[0] = createLTLExpr(p[1], [p[2]])  # (operator, operand list)
 
 def p_expression_binary(p):
     '''expression : expression R expression
@@ -68,22 +73,21 @@ def p_expression_binary(p):
                   | expression OR expression
                   | expression AND expression
                   '''
-    p[0] = {"kind": p[2], "operators": [p[1], p[3]]}  # (operator, operand list)
+    p[0] = createLTLExpr(p[2], [p[1], p[3]])  # (operator, operand list)
 
 def p_expression_group(p):
     '''expression : LPAREN expression RPAREN'''
     p[0] = p[2]  # Grouping, just pass the inner expression
 
-def z3parse(s):
+def z3parse(s, variables):
   das = s[1:-1]
   idregex = r"\b[a-zA-Z][a-zA-Z0-9_]*\b"
   identifiers = re.findall(idregex, das)
-  z3vars = getz3vars(identifiers, variables)
-  return eval(das, {}, z3vars)
+  return eval(das, {}, getz3vars(identifiers, variables))
 
 def p_expression_string(p):
     '''expression : STRING'''
-    p[0] = z32ltlt(z3parse(p[1]))  # A string leaf
+    p[0] = z32ltlt(z3parse(p[1], p.lexer.variables))  # A string leaf
 
 # Error rule for syntax errors
 def p_error(p):
@@ -91,15 +95,15 @@ def p_error(p):
     error(p)
 
 # Build the parser
-parser = yacc.yacc(debug=0)
+parser = yacc.yacc(debug=0, tabmodule="ltltparsetab")
 
 def checkFetchLevel(f):
   def cfl(f,l):
     if isZ3(f):
       return fetchdepth(getZ3(f)) <= l
-    if f["kind"] == "X":
+    if f.kind == "X":
       l = l+1
-    return all([cfl(x,l) for x in f["operators"]])
+    return all([cfl(x,l) for x in f.operators])
   return cfl(f,0)
 
 def replace_expressions(text):
@@ -110,11 +114,17 @@ def replace_expressions(text):
   return replace_nested(text)
 
 # Example usage
-def ltltparse(bstr, variables_value):
-  global variables
-  variables = variables_value
+# The parser keeps its state in itself, so parses do not overlap; each one
+# gets a copy of the lexer that also carries the variables of the spec
+parselock = threading.Lock()
+
+@timed("parsing", "ltltparse")
+def ltltparse(bstr, variables):
   bstr = replace_expressions(bstr)
-  structed = parser.parse(bstr, lexer=lexer)
+  speclexer = lexer.clone()
+  speclexer.variables = variables
+  with parselock:
+    structed = parser.parse(bstr, lexer=speclexer)
   if not checkFetchLevel(structed):
     error("Fetched variable with wrong level of X")
   return structed
@@ -0,0 +1,42 @@
+
+# ltltparsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'leftIMPLIESBIDIRECTIONALWRleftANDORrightFGXNEGAND BIDIRECTIONAL F G IMPLIES LPAREN NEG OR R RPAREN STRING W Xexpression : F expression\n                  | G expression\n                  | X expression\n                  | NEG expressionexpression : expression R expression\n                  | expression W expression\n                  | expression BIDIRECTIONAL expression\n                  | expression IMPLIES expression\n                  | expression OR expression\n                  | expression AND expression\n                  expression : LPAREN expression RPARENexpression : STRING'
+    
+_lr_action_items = {'F':([0,2,3,4,5,6,8,9,10,11,12,13,],[2,2,2,2,2,2,2,2,2,2,2,2,]),'G':([0,2,3,4,5,6,8,9,10,11,12,13,],[3,3,3,3,3,3,3,3,3,3,3,3,]),'X':([0,2,3,4,5,6,8,9,10,11,12,13,],[4,4,4,4,4,4,4,4,4,4,4,4,]),'NEG':([0,2,3,4,5,6,8,9,10,11,12,13,],[5,5,5,5,5,5,5,5,5,5,5,5,]),'LPAREN':([0,2,3,4,5,6,8,9,10,11,12,13,],[6,6,6,6,6,6,6,6,6,6,6,6,]),'STRING':([0,2,3,4,5,6,8,9,10,11,12,13,],[7,7,7,7,7,7,7,7,7,7,7,7,]),'$end':([1,7,14,15,16,17,19,20,21,22,23,24,25,],[0,-12,-1,-2,-3,-4,-5,-6,-7,-8,-9,-10,-11,]),'R':([1,7,14,15,16,17,18,19,20,21,22,23,24,25,],[8,-12,-1,-2,-3,-4,8,-5,-6,-7,-8,-9,-10,-11,]),'W':([1,7,14,15,16,17,18,19,20,21,22,23,24,25,],[9,-12,-1,-2,-3,-4,9,-5,-6,-7,-8,-9,-10,-11,]),'BIDIRECTIONAL':([1,7,14,15,16,17,18,19,20,21,22,23,24,25,],[10,-12,-1,-2,-3,-4,10,-5,-6,-7,-8,-9,-10,-11,]),'IMPLIES':([1,7,14,15,16,17,18,19,20,21,22,23,24,25,],[11,-12,-1,-2,-3,-4,11,-5,-6,-7,-8,-9,-10,-11,]),'OR':([1,7,14,15,16,17,18,19,20,21,22,23,24,25,],[12,-12,-1,-2,-3,-4,12,12,12,12,12,-9,-10,-11,]),'AND':([1,7,14,15,16,17,18,19,20,21,22,23,24,25,],[13,-12,-1,-2,-3,-4,13,13,13,13,13,-9,-10,-11,]),'RPAREN':([7,14,15,16,17,18,19,20,21,22,23,24,25,],[-12,-1,-2,-3,-4,25,-5,-6,-7,-8,-9,-10,-11,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'expression':([0,2,3,4,5,6,8,9,10,11,12,13,],[1,14,15,16,17,18,19,20,21,22,23,24,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> expression","S'",1,None,None,None),
+  ('expression -> F expression','expression',2,'p_expression_unary','ltltparser.py',61),
+  ('expression -> G expression','expression',2,'p_expression_unary','ltltparser.py',62),
+  ('expression -> X expression','expression',2,'p_expression_unary','ltltparser.py',63),
+  ('expression -> NEG expression','expression',2,'p_expression_unary','ltltparser.py',64),
+  ('expression -> expression R expression','expression',3,'p_expression_binary','ltltparser.py',68),
+  ('expression -> expression W expression','expression',3,'p_expression_binary','ltltparser.py',69),
+  ('expression -> expression BIDIRECTIONAL expression','expression',3,'p_expression_binary','ltltparser.py',70),
+  ('expression -> expression IMPLIES expression','expression',3,'p_expression_binary','ltltparser.py',71),
+  ('expression -> expression OR expression','expression',3,'p_expression_binary','ltltparser.py',72),
+  ('expression -> expression AND expression','expression',3,'p_expression_binary','ltltparser.py',73),
+  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_group','ltltparser.py',78),
+  ('expression -> STRING','expression',1,'p_expression_string','ltltparser.py',89),
+]
@@ -1,24 +1,43 @@
 import yaml
+import json
 import argparse
+import cProfile
+import signal
 import sys
+import traceback
+from collections import Counter
+from itertools import repeat
 from .config import CONFIG
 from .datatypes import *
 from .boolizer import Booleanizer, mapfetch
 from .refinement import refinetauto
 from . import maybenotz3 as mnz3
 from .hoaparser import nodes2dot, play2str
+from .mealyfile import writemealyfile
 from .reporter import Reporter
 from .specreader import readfromyaml
 from .strixcaller import callstrix
+from .strixcache import StrixCache
+from .timers import TIMERS, timed
 from .ltltparser import ltltparse
+from .parallel import parallelcheck
+from .lemmas import addeagerlemmas
+from .scheduler import Scheduler
 
 sys.setrecursionlimit(10000)
 
-def envPlayNewThTauto(envz3):
+def envPlaySat(edge):
+  envcube = edge.getEnvCube()
+  if envcube is not None and all(mnz3.theorysolver.accepts(atom) for atom, _ in envcube):
+    return mnz3.isSatCube(envcube)
+  envz3 = edge.getEnvPlay()
   z3envvars = z3getvars(envz3)
   envexists = mnz3.make_exists(z3envvars, envz3)
-  if not mnz3.isSat(envexists):
-    return ltlNeg(z32ltlt(envz3))
+  return mnz3.isSat(envexists)
+
+def envPlayNewThTauto(edge):
+  if not envPlaySat(edge):
+    return ltlNeg(z32ltlt(edge.getEnvPlay()))
   return None
 
 def sysPlayNewThTauto(envz3, sysz3, boolizer):
@@ -35,36 +54,48 @@ def sysPlayNewThTauto(envz3, sysz3, boolizer):
   newtauto = ltlDisj(ltlNeg(z32ltlt(sysz3)), z32ltlt(partition))
   return newtauto
 
+@timed("theoryTauto")
 def theoryTauto(edge, boolizer):
-  envz3 = edge.getEnvPlay()
-  envtauto = envPlayNewThTauto(envz3)
+  envtauto = envPlayNewThTauto(edge)
   if envtauto is not None:
     return (EDGEKIND.UNREACHABLE if boolizer.realizable else EDGEKIND.ILLEGAL, envtauto)
+  envz3 = edge.getEnvPlay()
   sysz3 = edge.getSysResponse()
   systauto = sysPlayNewThTauto(envz3, sysz3, boolizer)
   if systauto is not None:
     return (EDGEKIND.ILLEGAL if boolizer.realizable else EDGEKIND.UNREACHABLE, systauto)
   return EDGEKIND.LEGAL, None
 
-def thConsistent(edge, boolizer, nonewtautosallowed):
+def thCheck(edge, boolizer):
   edgekind, newthm = theoryTauto(edge, boolizer)
   if edgekind == EDGEKIND.ILLEGAL:
-    dbg1("Found theory inconsistency")
-    newthm = refinetauto(boolizer, newthm)
-    if newthm is None:
-      dbg1("But there was no new knowledge")
-      assert(nonewtautosallowed)
-    else:
-      dbg2("Adding theorem:")
-      dbg2(ltlt2str(newthm))
-      boolizer.addTauto(newthm)
-    return False
-  return True
+    return newthm
+  return None
+
+def thKey(edge):
+  return (edge.envplay, edge.sysplay)
+
+def thCovered(edge, boolizer):
+  return boolizer.knowledge.excludes(ltlConj(edge.envplay, edge.sysplay))
+
+def thLearn(newthm, boolizer):
+  if newthm is None:
+    return None
+  dbg1("Found theory inconsistency")
+  newthm = refinetauto(boolizer, newthm)
+  if newthm is None:
+    dbg1("But there was no new knowledge")
+    return 0
+  dbg2("Adding theorem:")
+  dbg2(ltlt2str(newthm))
+  boolizer.addTauto(newthm)
+  return 1
 
 def isFetchedVar(var):
   return var.decl().name().startswith("FETCH_")
 
-def tmpConsistent(edges, boolizer, nonewtautosallowed):
+@timed("tmpCheck")
+def tmpCheck(edges, boolizer):
   e0, e1 = edges
   tpre = mapfetch(mnz3.And(e0.getSysResponse(), e0.getEnvPlay()))
   e1envplay = e1.getEnvPlay()
@@ -74,11 +105,20 @@ def tmpConsistent(edges, boolizer, nonewtautosallowed):
   envexists = mnz3.make_exists(e1envvars, e1envplay)
   fullformula = mnz3.make_forall(prevars, mnz3.thImplies(tpre, envexists))
   if mnz3.isSat(fullformula):
-    return True
-  dbg1("Found temporal inconsistency")
+    return None
   unfetchedvars = [var for var in z3getvars(e1envplay) if not isFetchedVar(var)]
   fetchexpr = mnz3.eliminate_quantifier(mnz3.make_exists(unfetchedvars, e1envplay))
-  renamed_expr = mnz3.rename_vars(fetchexpr, lambda x: x[6:])
+  return mnz3.rename_vars(fetchexpr, lambda x: x[6:])
+
+def tmpKey(edges):
+  # The sys play of e1 only adds vacuous quantifiers to tmpCheck
+  e0, e1 = edges
+  return (e0.envplay, e0.sysplay, e1.envplay)
+
+def tmpLearn(renamed_expr, boolizer):
+  if renamed_expr is None:
+    return None
+  dbg1("Found temporal inconsistency")
   missingTautos = boolizer.missingTautos(renamed_expr)
   if (missingTautos):
     dbg2("Adding tmp tautos:")
@@ -87,47 +127,109 @@ def tmpConsistent(edges, boolizer, nonewtautosallowed):
       boolizer.createtmpassumptionfor(t)
   else:
     dbg2("No new temporal tautos")
-    assert(nonewtautosallowed)
-  return False
+  return len(missingTautos)
 
 def dbgedgeprint(i,nodesn):
   sys.stdout.write('\r')
   sys.stdout.write(f"Checking edge {i}/{nodesn}. ")
   sys.stdout.flush()
 
-def checkconsistencywith(edges, boolizer, consf, inconsistencies = 0):
+def checkconsistencywith(edges, boolizer, checkf, learnf, keyf, scheduler, inconsistencies = 0):
   # You can provide a value for inconsistencies (and return it)
   # if you want to share the inconsistencies checker between the temporal
   # and the theories checker.
   # You will also have to handle the boolean short-circuit.
+  # checkf only inspects the edge; everything that is learnt from it
+  # happens in learnf, in the order of the scheduler, so the verdict does
+  # not depend on whether the checks run here or in the worker pool.
+  # learnf returns None for a consistent edge and the number of lemmas
+  # learnt from it otherwise. The check stops once more edges than the
+  # tolerance are inconsistent and a batch of lemmas has been learnt.
+  # An inconsistent edge may teach nothing new, as the scheduler no longer
+  # checks the edges in the order of the controller: it counts as a failure
+  # and the scan goes on. Only a scan that finds inconsistencies
+  # and learns nothing at all is an error, as Strix would answer the same.
+  # Edges with the same labels (same keyf, labels are hash-consed) get
+  # the same check, so only the first of them is checked and learnt from.
   nodesn = len(edges)
   allconsistent = True
-  for idx, edge in enumerate(edges, 1):
-    dbg1(lambda: dbgedgeprint(idx,nodesn))
-    edgeconsistent = consf(edge, boolizer, inconsistencies > 0)
-    if not edgeconsistent:
-      inconsistencies += 1
+  repeated = Counter(keyf(edge) for edge in edges)
+  distinct = {}
+  for edge in edges:
+    distinct.setdefault(keyf(edge), edge)
+  distinct = scheduler.order(list(distinct.items()))
+  CONFIG.reporter.addcount("savedchecks", nodesn - len(distinct))
+  dbg1(f"{nodesn - len(distinct)} of {nodesn} checks are repeated")
+  if CONFIG.jobs > 1:
+    flagged = parallelcheck([edge for _, edge in distinct], boolizer, checkf)
+  else:
+    flagged = repeat(True)
+  learnt = 0
+  for idx, ((key, edge), flag) in enumerate(zip(distinct, flagged), 1):
+    dbg1(lambda: dbgedgeprint(idx,len(distinct)))
+    if learnt > 0 and scheduler.covered(edge, boolizer):
+      CONFIG.reporter.addcount("coverededges", 1)
+      continue
+    lemmas = learnf(checkf(edge, boolizer) if flag else None, boolizer)
+    if lemmas is not None:
+      scheduler.fail(key, edge)
+      CONFIG.reporter.addcount("lemmas", lemmas)
+      learnt += lemmas
+      inconsistencies += repeated[key]
       allconsistent = False
-    if inconsistencies > CONFIG.inconsistent_edges_tolerance:
+    if inconsistencies > CONFIG.inconsistent_edges_tolerance and learnt >= CONFIG.refinement_batch:
       return False
+  if not allconsistent and learnt == 0:
+    error("The controller has inconsistent edges, but there is nothing new to learn from them")
   return allconsistent
 
-def writemealy(mealyfname, nodes, specdata):
+def mealydata(nodes, specdata):
   specdata["transtab"] = {k: getZ3(v).sexpr() for k, v in nodes[0].edges[0].transtab.items()}
   specdata["nodes"] = [[{"envplay": ltlt2str(edge.envplay), "sysplay": ltlt2str(edge.sysplay), "outnoden": edge.outnoden} for edge in node.edges] for node in nodes]
+  return specdata
+
+def writemealy(mealyfname, nodes, specdata):
+  if mealyfname.endswith(".mealy"):
+    writemealyfile(mealyfname, mealydata(nodes, specdata))
+    return
   with open(mealyfname, "w") as f:
-    yaml.dump(specdata, f, default_flow_style=False, sort_keys=False)
+    yaml.dump(mealydata(nodes, specdata), f, default_flow_style=False, sort_keys=False)
 
-def parse_arguments():
-  parser = argparse.ArgumentParser('LTL fetch')
+class RaisingArgumentParser(argparse.ArgumentParser):
+  # For options given to the API or the server: a bad option fails that
+  # call with a SyntheosError, instead of printing the usage and exiting
+  def error(self, message):
+    raise SyntheosError(message)
+
+def makeparser(raising = False):
+  if raising:
+    parser = RaisingArgumentParser('LTL fetch', add_help=False)
+  else:
+    parser = argparse.ArgumentParser('LTL fetch')
   parser.add_argument('--yaml', help='YAML with specification', type=str, default=None)
   parser.add_argument('--dbglevel', help='Debug level', type=int, default=0)
   parser.add_argument('--strixmaxsecs', help='Maximum seconds', type=int, default=None)
   parser.add_argument('--reportdir', help='Reports root dir', type=str, default="")
-  parser.add_argument('--save-mealy', nargs="?", const="", help='Save mealy machine to file', type=str, default=None)
+  parser.add_argument('--save-mealy', nargs="?", const="", help='Save mealy machine to file (binary if it ends in .mealy)', type=str, default=None)
   parser.add_argument("--show-mealy", action="store_true", help='Show mealy machine')
   parser.add_argument('--inconsistent-edges-tolerance', help='Maximum illegal edges tolerance', type=int, default=0)
-  return parser.parse_args()
+  parser.add_argument('--refinement-batch', help='Lemmas to learn from a controller before calling Strix again', type=int, default=1)
+  parser.add_argument('--jobs', help='Worker processes for the edge consistency checks', type=int, default=1)
+  parser.add_argument('--z3cache', help='SQLite file caching Z3 queries across runs', type=str, default=None)
+  parser.add_argument('--z3cache-size', help='Z3 queries kept in the in-memory cache', type=int, default=4096)
+  parser.add_argument('--strixcache', help='Directory caching Strix outputs', type=str, default=".strixcache")
+  parser.add_argument('--strixcache-mb', help='Size cap of the Strix cache in megabytes', type=int, default=256)
+  parser.add_argument('--strix-portfolio', help='Also race Strix with these options (repeatable, e.g. --strix-portfolio="--exploration bfs")', action="append", default=[])
+  parser.add_argument('--no-strixcache', action="store_true", help='Always call Strix, bypassing its cache')
+  parser.add_argument('--profile', action="store_true", help='Write cProfile statistics next to the report')
+  parser.add_argument('--sympy-refinement', action="store_true", help='Find new knowledge by distributing with sympy')
+  parser.add_argument('--serve', help='Serve requests on host:port or unix:PATH instead of reading a spec', type=str, default=None)
+  parser.add_argument('--serve-jobs', help='Specs solved at the same time when serving', type=int, default=2)
+  parser.add_argument('--eager-lemmas', help='Learn the infeasible conjunctions of up to this many literals before calling Strix', type=int, default=0)
+  return parser
+
+def parse_arguments(argv = None):
+  return makeparser().parse_args(argv)
 
 def initialize_boolizer(specdata):
   variables = specdata["variables"]
@@ -139,14 +241,19 @@ def initialize_boolizer(specdata):
   return boolizer
 
 def cegres(boolizer):
+  TIMERS.newiteration() # Parsing the spec is not part of any iteration
+  thscheduler = Scheduler(thCovered)
+  tmpscheduler = Scheduler()
   while True:
     nodes = callstrix(boolizer)
     dbg3(lambda: print(nodes2dot(nodes)))
     edges = [edge for node in nodes for edge in node.edges]
     consedges = [[edge, consedge] for node in nodes for edge in node.edges for consedge in edge.outnode.edges]
-    if checkconsistencywith(edges, boolizer, thConsistent) and \
+    consistent = checkconsistencywith(edges, boolizer, thCheck, thLearn, thKey, thscheduler) and \
        (boolizer.maxfetchdepth == 0 or boolizer.realizable or \
-        checkconsistencywith(consedges, boolizer, tmpConsistent)):
+        checkconsistencywith(consedges, boolizer, tmpCheck, tmpLearn, tmpKey, tmpscheduler))
+    CONFIG.reporter.closeiteration(TIMERS.newiteration())
+    if consistent:
       return nodes
 
 def showorsave_mealy(args, nodes, specdata):
@@ -156,17 +263,65 @@ def showorsave_mealy(args, nodes, specdata):
   if args.save_mealy is not None:
     mealyfname = args.save_mealy if args.save_mealy != "" else (specdata["name"] + ".json")
     dbg1("Writing mealy to " + mealyfname)
-    writemealy(mealyfname, nodes, specdata)
+    try:
+      writemealy(mealyfname, nodes, specdata)
+    except OSError as e:
+      error("Cannot write the mealy machine to " + mealyfname + ": " + str(e.strerror or e))
 
-def main():
-  args = parse_arguments()
+def configure(args):
   CONFIG.inconsistent_edges_tolerance = args.inconsistent_edges_tolerance
+  CONFIG.refinement_batch = args.refinement_batch
+  CONFIG.jobs = args.jobs
+  CONFIG.sympy_refinement = args.sympy_refinement
+  CONFIG.z3cachesize = args.z3cache_size
+  CONFIG.z3cache = args.z3cache
   setdbglevel(args.dbglevel)
-  specdata = readfromyaml(args.yaml)
+  CONFIG.strixmaxsecs = args.strixmaxsecs
+  CONFIG.strixportfolio = [("default", [])] + [(options, options.split()) for options in args.strix_portfolio] if args.strix_portfolio else []
+  CONFIG.strixcache = None if args.no_strixcache else StrixCache(args.strixcache, args.strixcache_mb * 1024 * 1024)
+
+def synthesize(specdata, args):
   reporter = Reporter(specdata, args.reportdir)
   CONFIG.reporter = reporter
-  CONFIG.strixmaxsecs = args.strixmaxsecs
+  profiler = cProfile.Profile() if args.profile else None
+  if profiler is not None:
+    profiler.enable()
   boolizer = initialize_boolizer(specdata)
+  if args.eager_lemmas > 0:
+    reporter.setstats("eagerlemmas", addeagerlemmas(boolizer, args.eager_lemmas))
   nodes = cegres(boolizer)
-  print("Done. The property is %s." % ("realizable" if boolizer.realizable else "unrealizable"))
-  showorsave_mealy(args, nodes, specdata)
+  if profiler is not None:
+    profiler.disable()
+    reporter.dumpprofile(profiler)
+  dbg1("Z3 query cache: " + json.dumps(mnz3.querycache.stats()))
+  dbg1("Phases: " + json.dumps(TIMERS.snapshot()))
+  reporter.setstats("verdict", "realizable" if boolizer.realizable else "unrealizable")
+  reporter.setstats("literals", len(boolizer.littable))
+  reporter.setstats("phases", TIMERS.snapshot())
+  reporter.setstats("z3cache", mnz3.querycache.stats())
+  reporter.dump()
+  return boolizer, nodes
+
+def terminate(signum, frame):
+  # Unwinding runs the cleanups that kill the Strix being waited for
+  raise SystemExit(128 + signum)
+
+def main():
+  args = parse_arguments()
+  try:
+    if args.serve is not None:
+      from .server import serve
+      serve(args)
+      return
+    signal.signal(signal.SIGTERM, terminate)
+    configure(args)
+    specdata = readfromyaml(args.yaml)
+    boolizer, nodes = synthesize(specdata, args)
+    print("Done. The property is %s." % ("realizable" if boolizer.realizable else "unrealizable"))
+    showorsave_mealy(args, nodes, specdata)
+  except SyntheosError as e:
+    if args.dbglevel > 0:
+      traceback.print_exc()
+    print("ERROR:")
+    print(e)
+    exit(-1)
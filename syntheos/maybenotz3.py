@@ -1,5 +1,109 @@
 # Surprise! It is z3
 from z3 import *
+from .querycache import QueryCache
+from .timers import timed
+
+querycache = QueryCache()
+
+def hasquantifier(expr):
+  if is_quantifier(expr):
+    return True
+  return any(hasquantifier(c) for c in expr.children())
+
+class TheorySolver:
+  # A long-lived solver holding one definition lit!i == atom per theory
+  # atom it has been asked about. Cube queries and unsat cores become
+  # check(assumptions) calls, so nothing is rebuilt between them and the
+  # lemmas Z3 learns about the atoms are kept.
+  #
+  # Cubes are also bitsets over the indices of those atoms (bit 2i for
+  # atom i, bit 2i+1 for its negation). Unsat cores and the models found so
+  # far are kept as such bitsets: a cube containing a known unsat core is
+  # unsat and a cube contained in a known model is sat, without calling Z3.
+  def __init__(self, maxmodels=4096):
+    self.solver = Solver()
+    self.indices = {}
+    self.literals = []
+    self.unsatcores = []
+    self.models = []
+    self.maxmodels = maxmodels
+
+  def accepts(self, atom):
+    return not hasquantifier(atom)
+
+  def index(self, atom):
+    key = atom.get_id()
+    if key not in self.indices:
+      b = Bool("lit!" + str(len(self.literals)))
+      self.solver.add(b == atom)
+      # Keeping the atom alive keeps its id from being reused
+      self.indices[key] = len(self.literals)
+      self.literals.append((b, atom))
+    return self.indices[key]
+
+  def literal(self, atom, polarity=True):
+    if is_not(atom):
+      return self.literal(atom.arg(0), not polarity)
+    return self.index(atom), polarity
+
+  def assumption(self, literal):
+    b = self.literals[literal[0]][0]
+    return b if literal[1] else Not(b)
+
+  def bit(self, literal):
+    return 1 << (2 * literal[0] + (0 if literal[1] else 1))
+
+  def check(self, assumptions):
+    satres = self.solver.check(*assumptions)
+    if satres == unknown:
+      error("Unkown satisfiability")
+    return satres
+
+  def learnmodel(self):
+    model = self.solver.model()
+    mask = 0
+    for i, (b, _) in enumerate(self.literals):
+      mask |= self.bit((i, is_true(model.eval(b, model_completion=True))))
+    self.models.append(mask)
+    if len(self.models) > self.maxmodels:
+      self.models.pop(0)
+
+  def learncore(self, literals):
+    core = self.solver.unsat_core()
+    mask = 0
+    indices = []
+    for i, l in enumerate(literals):
+      if any(self.assumption(l).eq(c) for c in core):
+        mask |= self.bit(l)
+        indices.append(i)
+    self.unsatcores.append(mask)
+    return indices
+
+  def issatcube(self, cube):
+    literals = [self.literal(atom, polarity) for atom, polarity in cube]
+    mask = 0
+    for l in literals:
+      mask |= self.bit(l)
+    if any(core & ~mask == 0 for core in self.unsatcores):
+      querycache.count("cube", "memhits")
+      return False
+    if any(mask & ~model == 0 for model in self.models):
+      querycache.count("cube", "memhits")
+      return True
+    querycache.count("cube", "misses")
+    if self.check(list(map(self.assumption, literals))) == sat:
+      self.learnmodel()
+      return True
+    self.learncore(literals)
+    return False
+
+  def unsatcoreindices(self, atoms):
+    literals = [self.literal(atom) for atom in atoms]
+    result = self.check(list(map(self.assumption, literals)))
+    assert result == unsat
+    return self.learncore(literals)
+
+theorysolver = TheorySolver()
 
 def isz3const(e):
   return not isz3var(e) and (is_int_value(e) or is_rational_value(e) or is_true(e) or is_false(e))
@@ -18,8 +122,29 @@ def make_forall(varlist, formula):
 def make_exists(varlist, formula):
   return quantify(Exists, varlist, formula)
 
-def isSat(formula):
-  formula = simplify(formula)
+def querykey(formulas):
+  freevars = sorted({v.decl().name() + ":" + str(v.sort()) for f in formulas for v in z3util.get_vars(f)})
+  return " ".join(freevars) + "\n" + "\n".join(f.sexpr() for f in formulas)
+
+def foldnumerals(expr):
+  # The SMT-LIB printer writes -3 as (- 3) and 1/2 as (/ 1.0 2.0), which
+  # parse back as applications rather than as numerals.
+  if is_quantifier(expr) or expr.num_args() == 0:
+    return expr
+  children = [foldnumerals(c) for c in expr.children()]
+  if expr.decl().kind() == Z3_OP_UMINUS and (is_int_value(children[0]) or is_rational_value(children[0])):
+    if is_int_value(children[0]):
+      return IntVal(-children[0].as_long())
+    return RealVal(-children[0].as_fraction())
+  if expr.decl().kind() == Z3_OP_DIV and all(is_rational_value(c) for c in children):
+    return RealVal(children[0].as_fraction() / children[1].as_fraction())
+  return expr.decl()(*children)
+
+def parsewith(sexpr, formula):
+  decls = {v.decl().name(): v for v in z3util.get_vars(formula)}
+  return foldnumerals(parse_smt2_string(f"(assert {sexpr})", decls=decls)[0])
+
+def solvesat(formula):
   solver = Solver()
   solver.add(formula)
   satres = solver.check()
@@ -29,13 +154,32 @@ def isSat(formula):
     return False
   error("Unkown satisfiability")
 
+@timed("z3")
+def isSatCube(cube):
+  # cube is a list of (atom, polarity) pairs over quantifier-free atoms
+  return theorysolver.issatcube(cube)
+
+@timed("z3")
+def isSat(formula):
+  formula = simplify(formula)
+  return querycache.cached("isSat", querykey([formula]), lambda: solvesat(formula))
+
+@timed("z3")
 def eliminate_quantifier(formula):
-  return Tactic('qe2')(formula).as_expr()
+  def encode(result):
+    sexpr = result.sexpr()
+    try:
+      return sexpr if parsewith(sexpr, formula).eq(result) else None
+    except Z3Exception:
+      return None
+  return querycache.cached("qe", querykey([formula]),
+      lambda: Tactic('qe2')(formula).as_expr(),
+      encode=encode, decode=lambda sexpr: parsewith(sexpr, formula))
 
 def thImplies(f0, f1):
   return Implies(f0,f1)
 
-def getUnsatCore(atoms):
+def unsatcoreindices(atoms):
   s = Solver()
   s.set(unsat_core=True)
   enumatoms = list(enumerate(atoms))
@@ -44,7 +188,16 @@ def getUnsatCore(atoms):
   result = s.check()
   assert result == unsat
   c = s.unsat_core()
-  return [atom for i,atom in enumatoms if Bool('atom_'+str(i)) in c]
+  return [i for i,atom in enumatoms if Bool('atom_'+str(i)) in c]
+
+@timed("z3")
+def getUnsatCore(atoms):
+  if all(theorysolver.accepts(atom) for atom in atoms):
+    compute = lambda: theorysolver.unsatcoreindices(atoms)
+  else:
+    compute = lambda: unsatcoreindices(atoms)
+  indices = querycache.cached("unsatcore", querykey(atoms), compute)
+  return [atoms[i] for i in indices]
 
 def makevar(var, ty):
   match ty:
@@ -0,0 +1,168 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from .datatypes import *
+from .boolparser import boolparse
+from .hoaparser import Edge, readtranstab
+from .atomcompiler import compiletranstab
+
+# Binary controllers. A file starts with MAGIC, a version and the length of
+# a JSON header holding the spec data (variables, name...), the atoms (as
+# SMT-LIB) and the lengths of the arrays that follow it. The arrays are
+# little-endian int32, used straight from an mmap of the file:
+#
+#   nodeedges  edges of node i are nodeedges[i]:nodeedges[i+1] (CSR)
+#   edgeout    target node of each edge
+#   edgeenv    env label of each edge, as an index into the labels
+#   edgesys    sys label of each edge
+#   labelcode  code of label i is code[labelcode[i]:labelcode[i+1]] (CSR)
+#   code       labels in postfix: atom indices or TRUE, FALSE, NOT, AND, OR
+#
+# Loading reads the header and compiles the atoms, and the edges of a node
+# are decoded the first time the node is visited. Files only hold data:
+# nothing in them is run as code.
+
+MAGIC = b"SYNMEALY"
+VERSION = 2
+PREAMBLE = struct.Struct("<8sII")
+ARRAYS = ["nodeedges", "edgeout", "edgeenv", "edgesys", "labelcode", "code"]
+TRUE, FALSE, NOT, AND, OR = -1, -2, -3, -4, -5
+
+def encodelabel(label, atomindex, code):
+  if isBoolSym(label):
+    if isBoolSymTrue(label):
+      code.append(TRUE)
+    elif isBoolSymFalse(label):
+      code.append(FALSE)
+    else:
+      code.append(atomindex[symbol(label)])
+    return
+  for op in label.operators:
+    encodelabel(op, atomindex, code)
+  match label.kind:
+    case "!":
+      code.append(NOT)
+    case "&" | "|":
+      code.extend([AND if label.kind == "&" else OR] * (len(label.operators) - 1))
+    case _:
+      error("Unhandled case in label: " + label.kind)
+
+def decodelabel(code, atomnames):
+  stack = []
+  for c in code:
+    if c >= 0:
+      stack.append(ltlBoolSym(atomnames[c]))
+    elif c == TRUE:
+      stack.append(ltlBoolSym("t"))
+    elif c == FALSE:
+      stack.append(ltlBoolSym("f"))
+    elif c == NOT:
+      stack.append(ltlNeg(stack.pop()))
+    else:
+      b = stack.pop()
+      stack.append((ltlConj if c == AND else ltlDisj)(stack.pop(), b))
+  return stack.pop()
+
+def intarray(buffer, offset, length):
+  if sys.byteorder == "little":
+    return memoryview(buffer)[offset:offset + 4 * length].cast("i")
+  a = array("i", buffer[offset:offset + 4 * length])
+  a.byteswap()
+  return a
+
+def writemealyfile(fname, data):
+  # data is a controller as written to YAML (see main.mealydata)
+  variables = data["variables"]
+  atomnames = list(data["transtab"])
+  atomindex = {k: i for i, k in enumerate(atomnames)}
+  atoms = readtranstab(data["transtab"], variables)
+  arrays = {name: array("i") for name in ARRAYS}
+  arrays["nodeedges"].append(0)
+  arrays["labelcode"].append(0)
+  labels = {}
+
+  def labelindex(text):
+    if text not in labels:
+      labels[text] = len(labels)
+      encodelabel(boolparse(text), atomindex, arrays["code"])
+      arrays["labelcode"].append(len(arrays["code"]))
+    return labels[text]
+
+  for edges in data["nodes"]:
+    for edge in edges:
+      arrays["edgeout"].append(edge["outnoden"])
+      arrays["edgeenv"].append(labelindex(edge["envplay"]))
+      arrays["edgesys"].append(labelindex(edge["sysplay"]))
+    arrays["nodeedges"].append(len(arrays["edgeout"]))
+
+  header = {k: v for k, v in data.items() if k not in ("transtab", "nodes")}
+  header["atoms"] = [{"name": k, "sexpr": data["transtab"][k]} for k in atomnames]
+  header["maxfetchdepth"] = max((fetchdepth(getZ3(v)) for v in atoms.values()), default=0)
+  header["arrays"] = {name: len(a) for name, a in arrays.items()}
+  headerbytes = json.dumps(header).encode()
+  headerbytes += b" " * (-len(headerbytes) % 4)
+
+  with open(fname, "wb") as f:
+    f.write(PREAMBLE.pack(MAGIC, VERSION, len(headerbytes)))
+    f.write(headerbytes)
+    for name in ARRAYS:
+      if sys.byteorder != "little":
+        arrays[name].byteswap()
+      f.write(arrays[name].tobytes())
+
+def ismealyfile(fname):
+  with open(fname, "rb") as f:
+    return f.read(len(MAGIC)) == MAGIC
+
+def convertmealy(yamlfname, fname):
+  import yaml
+  with open(yamlfname, "r") as f:
+    writemealyfile(fname, yaml.safe_load(f))
+
+class LazyNode:
+  def __init__(self, name, mealy):
+    self.name = name
+    self.mealy = mealy
+    self.decoded = None
+
+  @property
+  def edges(self):
+    if self.decoded is None:
+      self.decoded = self.mealy.edges(int(self.name))
+    return self.decoded
+
+class MealyFile:
+  def __init__(self, fname):
+    with open(fname, "rb") as f:
+      self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, headerlen = PREAMBLE.unpack_from(self.buffer)
+    if magic != MAGIC or version != VERSION:
+      error("Not a version %d controller file: %s" % (VERSION, fname))
+    offset = PREAMBLE.size + headerlen
+    self.header = json.loads(self.buffer[PREAMBLE.size:offset])
+    for name in ARRAYS:
+      length = self.header["arrays"][name]
+      setattr(self, name, intarray(self.buffer, offset, length))
+      offset += 4 * length
+    self.variables = self.header["variables"]
+    self.maxfetchdepth = self.header["maxfetchdepth"]
+    self.atomnames = [a["name"] for a in self.header["atoms"]]
+    self.transtab = readtranstab({a["name"]: a["sexpr"] for a in self.header["atoms"]}, self.variables)
+    self.nodes = [LazyNode(str(i), self) for i in range(len(self.nodeedges) - 1)]
+    self.labels = {}
+
+  def atoms(self):
+    return compiletranstab(self.transtab)
+
+  def label(self, i):
+    if i not in self.labels:
+      self.labels[i] = decodelabel(self.code[self.labelcode[i]:self.labelcode[i + 1]], self.atomnames)
+    return self.labels[i]
+
+  def edges(self, noden):
+    return [
+      Edge(self.label(self.edgeenv[j]), self.label(self.edgesys[j]), self.nodes[self.edgeout[j]], self.edgeout[j], self.transtab)
+      for j in range(self.nodeedges[noden], self.nodeedges[noden + 1])
+    ]
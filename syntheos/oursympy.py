@@ -1,8 +1,10 @@
 from sympy import *
 from sympy.logic.boolalg import *
-from sympy.logic.inference import satisfiable
 from itertools import chain
-from .datatypes import ltlt2str, ltl2sympy, error, dbg2, dbg3
+from functools import reduce
+from .datatypes import *
+from . import maybenotz3 as mnz3
+from .timers import timed
 
 def ourdistribute(expr):
   if isinstance(expr, Or):
@@ -18,12 +20,61 @@ def ourdistribute(expr):
     return chain(*map(ourdistribute, expr.args))
   return [expr]
 
-def isnewknowledge(sympyknowledge, tauto):
-  ret = satisfiable(~tauto & sympyknowledge)
-  return ret
+def ltl2sympy(formula):
+  if isBoolSym(formula):
+    sym = symbol(formula)
+    return Symbol(sym)
+  sympyfuns = {
+      "!": Not,
+      "&": And,
+      "|": Or,
+  }
+  return sympyfuns[formula.kind](*(list(map(ltl2sympy, formula.operators))))
 
-def getnewknowledge(booltautos, expr):
-  sympyknowledge = And(*(map(ltl2sympy, booltautos)))
+def sympy2ltl(e):
+  if len(e.args)==0:
+    if e == true:
+      name = 't'
+    elif e == false:
+      name = 'f'
+    else:
+      name = e.name
+    return ltlBoolSym(name)
+  newargs = map(sympy2ltl, e.args)
+  if e.func == Not:
+    return ltlNeg(*newargs)
+  if e.func == Or:
+    return reduce(ltlDisj, newargs)
+  if e.func == And:
+    return reduce(ltlConj, newargs)
+  error("Unhandled case:" + str(e))
+
+def sympy2z3(expr):
+  if expr == true:
+    return mnz3.BoolVal(True)
+  if expr == false:
+    return mnz3.BoolVal(False)
+  if isinstance(expr, Symbol):
+    return boolsym2z3(expr.name)
+  z3funs = {
+      Not: mnz3.Not,
+      And: mnz3.And,
+      Or: mnz3.Or,
+  }
+  if expr.func not in z3funs:
+    error("Unhandled case:" + str(expr))
+  return z3funs[expr.func](*map(sympy2z3, expr.args))
+
+def boolsym2z3(name):
+  # ltl2sympy turns the constants t and f into symbols too
+  if name == "t":
+    return mnz3.BoolVal(True)
+  if name == "f":
+    return mnz3.BoolVal(False)
+  return mnz3.Bool(name)
+
+@timed("sympy", "getnewknowledge")
+def getnewknowledge(knowledge, expr):
   expr = sympify(expr)
   expr = eliminate_implications(expr)
   tautos = ourdistribute(expr)
@@ -33,7 +84,7 @@ def getnewknowledge(booltautos, expr):
     if dbgcnt > 10000:
       dbg3(f"Checking tauto {dbgcnt}")
       dbg3(tauto)
-    if isnewknowledge(sympyknowledge, tauto):
+    if knowledge.isnew(sympy2z3(tauto)):
       return tauto
   # error("No new knowledge?") # This might happen with no short-circuit
   return None
@@ -0,0 +1,89 @@
+from .config import CONFIG
+from .datatypes import *
+from .boolizer import Booleanizer
+from .hoaparser import Edge, readtranstab
+from . import maybenotz3 as mnz3
+from .timers import TIMERS
+
+# Z3 terms cannot be pickled, so the workers get the edge labels and the
+# transition table as SMT-LIB strings and rebuild everything in their own
+# Z3 context. They only report which edges are inconsistent: the parent
+# redoes the check for those, so whatever is learnt from them is made of
+# the very same Z3 terms (and literals) as in a sequential run.
+
+pools = {}
+workercontext = None
+
+def getpool():
+  # One pool per number of workers, so each check gets the --jobs it asked for
+  if CONFIG.jobs not in pools:
+    # Imported here, as most runs never start a pool
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    pools[CONFIG.jobs] = ProcessPoolExecutor(max_workers=CONFIG.jobs, mp_context=multiprocessing.get_context("spawn"))
+  return pools[CONFIG.jobs]
+
+def edgelabels(edge):
+  if isinstance(edge, Edge):
+    return (edge.envplay, edge.sysplay)
+  return tuple(map(edgelabels, edge))
+
+def makeedge(labels, transtab):
+  if isinstance(labels[0], LTLExpr):
+    return Edge(labels[0], labels[1], None, None, transtab)
+  return [makeedge(l, transtab) for l in labels]
+
+def firstedge(edge):
+  return edge if isinstance(edge, Edge) else firstedge(edge[0])
+
+def getcontext(context):
+  global workercontext
+  if workercontext is None or workercontext[0] != context:
+    variables, realizable, sexprs, cachepath = context
+    CONFIG.z3cache = cachepath
+    boolizer = Booleanizer(variables)
+    boolizer.realizable = realizable
+    workercontext = (context, boolizer, readtranstab(dict(sexprs), variables))
+  return workercontext[1], workercontext[2]
+
+def checkchunk(context, checkf, chunk):
+  boolizer, transtab = getcontext(context)
+  verdicts = [checkf(makeedge(labels, transtab), boolizer) is not None for labels in chunk]
+  return verdicts, mnz3.querycache.takestats(), TIMERS.take()
+
+def checkcubes(context, cubes):
+  _, transtab = getcontext(context)
+  unsats = [not mnz3.isSatCube([(ltlt2z3(transtab[l]), p) for l, p in cube]) for cube in cubes]
+  return unsats, mnz3.querycache.takestats(), TIMERS.take()
+
+def parallelcubes(cubes, boolizer):
+  # Infeasibility of cubes of literals of boolizer, as a list of booleans
+  sexprs = tuple((l, atom.sexpr()) for l, [atom, _] in boolizer.littable.items())
+  context = (boolizer.variables, boolizer.realizable, sexprs, mnz3.querycache.dbpath)
+  chunksize = max(1, len(cubes) // (CONFIG.jobs * 4))
+  chunks = [cubes[i:i+chunksize] for i in range(0, len(cubes), chunksize)]
+  unsats = []
+  for chunkunsats, stats, phases in getpool().map(checkcubes, [context] * len(chunks), chunks):
+    mnz3.querycache.addstats(stats)
+    TIMERS.merge(phases)
+    unsats.extend(chunkunsats)
+  return unsats
+
+def parallelcheck(edges, boolizer, checkf):
+  if not edges:
+    return
+  transtab = firstedge(edges[0]).transtab
+  sexprs = tuple((k, getZ3(v).sexpr()) for k, v in transtab.items())
+  context = (boolizer.variables, boolizer.realizable, sexprs, mnz3.querycache.dbpath)
+  chunksize = max(1, len(edges) // (CONFIG.jobs * 4))
+  chunks = [edges[i:i+chunksize] for i in range(0, len(edges), chunksize)]
+  futures = [getpool().submit(checkchunk, context, checkf, [edgelabels(e) for e in chunk]) for chunk in chunks]
+  try:
+    for chunk, future in zip(chunks, futures):
+      verdicts, stats, phases = future.result()
+      mnz3.querycache.addstats(stats)
+      TIMERS.merge(phases)
+      yield from verdicts
+  finally:
+    for future in futures:
+      future.cancel()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from .config import CONFIG
+
+# Two-tier cache for solver queries: an in-memory LRU holding the results as
+# they were returned, and an optional sqlite file (shared between runs and
+# between worker processes) holding them in serialized form. The cache is
+# shared by all the checks of a process, but which sqlite file it uses
+# (CONFIG.z3cache), how many entries it keeps in memory (CONFIG.z3cachesize)
+# and its hit counters are per check.
+
+class QueryCache:
+  def __init__(self):
+    self.memory = OrderedDict()
+    self.dbs = {}
+
+  @property
+  def dbpath(self):
+    return CONFIG.setdefault("z3cache", lambda: None)
+
+  @property
+  def maxsize(self):
+    return CONFIG.setdefault("z3cachesize", lambda: 4096)
+
+  @property
+  def db(self):
+    path = self.dbpath
+    if path is None:
+      return None
+    if path not in self.dbs:
+      db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+      db.execute("CREATE TABLE IF NOT EXISTS queries (key TEXT PRIMARY KEY, value TEXT)")
+      self.dbs[path] = db
+    return self.dbs[path]
+
+  @property
+  def counters(self):
+    return CONFIG.setdefault("querycounters", dict)
+
+  def count(self, kind, event):
+    self.addstats({kind: {event: 1}})
+
+  def stats(self):
+    return {kind: dict(c) for kind, c in self.counters.items()}
+
+  def takestats(self):
+    stats = self.counters
+    CONFIG.querycounters = {}
+    return stats
+
+  def addstats(self, stats):
+    for kind, kindcounters in stats.items():
+      for event, n in kindcounters.items():
+        self.counters.setdefault(kind, {"memhits": 0, "diskhits": 0, "misses": 0})[event] += n
+
+  def remember(self, key, value):
+    self.memory[key] = value
+    self.memory.move_to_end(key)
+    if len(self.memory) > self.maxsize:
+      self.memory.popitem(last=False)
+
+  def cached(self, kind, keytext, compute, encode=None, decode=None):
+    # encode returns None for values that cannot be stored faithfully;
+    # those are only kept in memory.
+    key = hashlib.sha256((kind + "\0" + keytext).encode("utf-8")).hexdigest()
+    if key in self.memory:
+      self.memory.move_to_end(key)
+      self.count(kind, "memhits")
+      return self.memory[key]
+    db = self.db
+    if db is not None:
+      row = db.execute("SELECT value FROM queries WHERE key = ?", (key,)).fetchone()
+      if row is not None:
+        value = json.loads(row[0])
+        value = decode(value) if decode is not None else value
+        self.remember(key, value)
+        self.count(kind, "diskhits")
+        return value
+    self.count(kind, "misses")
+    value = compute()
+    self.remember(key, value)
+    if db is not None:
+      stored = encode(value) if encode is not None else value
+      if stored is not None:
+        db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?)", (key, json.dumps(stored)))
+    return value
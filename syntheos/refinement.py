@@ -1,48 +1,48 @@
 from .datatypes import *
-from sympy import Symbol, srepr, Not, And, Or, false, true
-from .oursympy import getnewknowledge
+from .config import CONFIG
 from functools import reduce
 from itertools import chain
+from .timers import timed
 
-def sympy2ltl(e):
-  if len(e.args)==0:
-    if e == true:
-      name = 't'
-    elif e == false:
-      name = 'f'
-    else:
-      name = e.name
-    return ltlBoolSym(name)
-  newargs = map(sympy2ltl, e.args)
-  if e.func == Not:
-    return ltlNeg(*newargs)
-  if e.func == Or:
-    return reduce(ltlDisj, newargs)
-  if e.func == And:
-    return reduce(ltlConj, newargs)
-  error("Unhandled case:" + str(e))
+def sympyclause(boolizer, boolform):
+  # sympy takes longer to import than a small specification to solve
+  from .oursympy import getnewknowledge, ltl2sympy, sympy2ltl
+  newKnowledge = getnewknowledge(boolizer.knowledge, ltl2sympy(boolform))
+  if newKnowledge is None:
+    return None
+  return sympy2ltl(newKnowledge)
 
+def modelclause(boolizer, boolform):
+  clause = boolizer.knowledge.newclause(boolform)
+  if clause is None:
+    return None
+  assert clause, "Empty clause from a theory tautology"
+  return reduce(ltlDisj, clause)
+
+@timed("refinetauto")
 def refinetauto(boolizer, ltlform):
-  sympyform = ltl2sympy(boolizer.boolize(ltlform))
-  newKnowledge = getnewknowledge(boolizer.booltautos, sympyform)
-  if newKnowledge is None:
+  boolform = boolizer.boolize(ltlform)
+  if CONFIG.sympy_refinement:
+    tauto = sympyclause(boolizer, boolform)
+  else:
+    tauto = modelclause(boolizer, boolform)
+  if tauto is None:
     return None
-  tauto = sympy2ltl(newKnowledge)
   transtab = {k:ltlZ3(v) for [k,[v,_]] in boolizer.littable.items()}
   play = replaceliterals(tauto, transtab)
   return satcore(play)
 
 def getatoms(tauto):
-  if tauto["kind"] == "!":
-    f = tauto["operators"][0]
+  if tauto.kind == "!":
+    f = tauto.operators[0]
     return [ltlt2z3(f)]
-  if tauto["kind"] == "|":
-    return [x for op in tauto["operators"] for x in getatoms(op)]
+  if tauto.kind == "|":
+    return [x for op in tauto.operators for x in getatoms(op)]
   return [ltlt2z3(ltlNeg(tauto))]
 
 def negatom(atom):
-  if atom["kind"] == "!":
-    return atom["operators"][0]
+  if atom.kind == "!":
+    return atom.operators[0]
   return ltlNeg(atom)
 
 def satcore(tauto):
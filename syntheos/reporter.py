@@ -8,26 +8,54 @@ class Reporter:
     self.reportdir = reportdir
     self.calls = []
     self.currentcall = None
+    self.stats = {}
 
   def setcall(self, calldata):
     calldata["elapsed"] = round(calldata["elapsed"], 2)
     self.currentcall = calldata
 
   def closecall(self, verdict):
-    if self.reportdir == "":
-      return
     self.currentcall["verdict"] = verdict
     self.calls.append(self.currentcall)
 
+  def closeiteration(self, phases):
+    # The checks that follow a Strix call belong to its iteration
+    if self.calls:
+      self.calls[-1]["phases"] = phases
+
+  def addcount(self, name, n):
+    self.stats[name] = self.stats.get(name, 0) + n
+
+  def addcountto(self, name, key):
+    counts = self.stats.setdefault(name, {})
+    counts[key] = counts.get(key, 0) + 1
+
+  def setstats(self, name, stats):
+    self.stats[name] = stats
+
+  def getdir(self):
+    mydir = self.reportdir + "/" + self.specdata["name"]
+    Path(mydir).mkdir(parents=True, exist_ok=True)
+    return mydir
+
+  def dumpprofile(self, profiler):
+    import pstats
+    mydir = self.getdir() if self.reportdir != "" else "."
+    fname = mydir + "/" + self.specdata["name"]
+    profiler.dump_stats(fname + ".pstats")
+    with open(fname + ".profile.txt", "w+") as profilefile:
+      pstats.Stats(profiler, stream=profilefile).sort_stats("cumulative").print_stats(60)
+
   def dump(self):
     if self.reportdir == "":
       return
     name = self.specdata["name"]
-    mydir = self.reportdir + "/" + name
-    Path(mydir).mkdir(parents=True, exist_ok=True)
+    mydir = self.getdir()
     with open(mydir + "/root.txt", "w+") as reportfile:
       reportfile.write(json.dumps(self.specdata)+"\n")
       reportfile.write(json.dumps(self.calls))
+      if self.stats:
+        reportfile.write("\n" + json.dumps(self.stats))
     for i, call in enumerate(self.calls):
       fname = name + str(i) + ".tsl "
       out = ",".join(call["envvars"]) + " "
@@ -0,0 +1,44 @@
+from collections import Counter
+from .datatypes import *
+from .hoaparser import Edge
+
+# The order in which the edges of a controller are checked, so that a
+# failing iteration finds its lemmas early. Edges whose labels failed in an
+# earlier iteration go first, then edges by how often their literals were
+# part of failing edges. Ties keep the order of the controller, so the first
+# iteration checks the edges as Strix lists them.
+#
+# Once a lemma has been learnt in an iteration, the scheduler can skip the
+# edges that coveredf says the knowledge already rules out: the next
+# controller cannot take them, so checking them would only find a redundant
+# lemma.
+
+def labelsymbols(formula):
+  if isBoolSym(formula):
+    return [] if isBoolSymTrue(formula) or isBoolSymFalse(formula) else [symbol(formula)]
+  return [s for f in formula.operators for s in labelsymbols(f)]
+
+def edgesymbols(edge):
+  if isinstance(edge, Edge):
+    return set(labelsymbols(edge.envplay) + labelsymbols(edge.sysplay))
+  return set().union(*map(edgesymbols, edge))
+
+class Scheduler:
+  def __init__(self, coveredf = None):
+    self.coveredf = coveredf
+    self.failedkeys = set()
+    self.failures = Counter()
+
+  def score(self, key, edge):
+    return (key in self.failedkeys, sum(self.failures[s] for s in edgesymbols(edge)))
+
+  def order(self, keyededges):
+    # sorted is stable also in reverse, so ties keep their order
+    return sorted(keyededges, key=lambda ke: self.score(*ke), reverse=True)
+
+  def fail(self, key, edge):
+    self.failedkeys.add(key)
+    self.failures.update(edgesymbols(edge))
+
+  def covered(self, edge, boolizer):
+    return self.coveredf is not None and self.coveredf(edge, boolizer)
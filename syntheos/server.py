@@ -0,0 +1,132 @@
+import json
+import multiprocessing
+import os
+import signal
+import socketserver
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .api import check_realizability
+from .datatypes import *
+from .main import makeparser
+
+# Server mode: specs are posted as JSON to /check and solved by a fixed set
+# of worker processes that live as long as the server, so the imports, the
+# parser tables, the Z3 query cache and the cores and models of the theory
+# solver stay warm from one request to the next. Each worker solves one spec
+# at a time: at most --serve-jobs specs are solved at once, and the rest wait
+# for a worker. A request looks like
+#   {"spec": "<YAML text>", "options": ["--refinement-batch", "4"], "mealy": true}
+# where options are command line options of syntheos.py (those of the server
+# are not inherited). Only the solving and tuning options in CLIENTOPTIONS may
+# be set: anything that reads or writes files of the server (--yaml,
+# --reportdir, the caches, --save-mealy, --profile...) is refused with a 400.
+# A request is answered with
+#   {"status": "ok", "name": ..., "verdict": ..., "stats": {...}, "mealy": {...}}
+# or with {"status": "error", "error": ...}.
+
+CLIENTOPTIONS = {
+  "dbglevel", "strixmaxsecs", "inconsistent_edges_tolerance", "refinement_batch", "jobs",
+  "z3cache_size", "no_strixcache", "sympy_refinement", "eager_lemmas",
+}
+
+def clientoptions(options):
+  # Raises SyntheosError if the options are malformed or set anything that
+  # is not in CLIENTOPTIONS. Checking the parsed values, not the strings,
+  # also catches abbreviations such as --report=/tmp
+  parser = makeparser(raising=True)
+  args = parser.parse_args(options)
+  refused = [action.option_strings[0] for action in parser._actions
+    if action.dest not in CLIENTOPTIONS and getattr(args, action.dest) != action.default]
+  if refused:
+    error("options not allowed by the server: " + ", ".join(refused))
+
+def warmup():
+  # Runs when a worker starts, after this module (and so everything else)
+  # has been imported. Interrupting the server stops the workers through
+  # the shutdown of the pool.
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def solverequest(spec, options, withmealy):
+  try:
+    result = check_realizability(spec, options)
+  except SyntheosError as e:
+    return {"status": "error", "error": str(e)}
+  except Exception as e:
+    return {"status": "error", "error": repr(e)}
+  reply = {"status": "ok", "name": result.name, "verdict": result.verdict, "stats": result.stats}
+  if withmealy:
+    reply["mealy"] = result.mealy()
+  return reply
+
+class Handler(BaseHTTPRequestHandler):
+  def reply(self, code, data):
+    body = json.dumps(data).encode("utf-8")
+    self.send_response(code)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def address_string(self):
+    # Clients of a Unix socket have no address
+    return self.client_address[0] if self.client_address else "local"
+
+  def do_GET(self):
+    if self.path != "/health":
+      return self.reply(404, {"status": "error", "error": "unknown path " + self.path})
+    self.reply(200, {"status": "ok", "jobs": self.server.jobs})
+
+  def do_POST(self):
+    if self.path != "/check":
+      return self.reply(404, {"status": "error", "error": "unknown path " + self.path})
+    try:
+      request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+      spec = request["spec"]
+      options = [str(o) for o in request.get("options", [])]
+    except (ValueError, KeyError, TypeError) as e:
+      return self.reply(400, {"status": "error", "error": "bad request: " + repr(e)})
+    try:
+      clientoptions(options)
+    except SyntheosError as e:
+      return self.reply(400, {"status": "error", "error": str(e)})
+    result = self.server.pool.submit(solverequest, spec, options, bool(request.get("mealy", False))).result()
+    self.reply(200 if result["status"] == "ok" else 422, result)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+
+def stalesocket(path):
+  # Only a socket, like one left by an earlier server, is ever replaced
+  try:
+    return stat.S_ISSOCK(os.lstat(path).st_mode)
+  except FileNotFoundError:
+    return False
+
+def makeserver(address):
+  if address.startswith("unix:"):
+    path = address[5:]
+    if stalesocket(path):
+      os.remove(path)
+    elif os.path.lexists(path):
+      error(path + " exists and is not a socket")
+    return UnixHTTPServer(path, Handler)
+  host, _, port = address.rpartition(":")
+  return ThreadingHTTPServer((host or "127.0.0.1", int(port)), Handler)
+
+def serve(args):
+  server = makeserver(args.serve)
+  server.jobs = args.serve_jobs
+  server.pool = ProcessPoolExecutor(max_workers=args.serve_jobs, mp_context=multiprocessing.get_context("spawn"), initializer=warmup)
+  for _ in range(args.serve_jobs):
+    server.pool.submit(warmup)
+  print("Serving on " + args.serve, flush=True)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    server.pool.shutdown(cancel_futures=True)
+    if args.serve.startswith("unix:") and stalesocket(args.serve[5:]):
+      os.remove(args.serve[5:])
@@ -1,9 +1,10 @@
 import yaml
 from .datatypes import *
 from pathlib import Path
+from .timers import timed
 
+@timed("parsing", "readfromyaml")
 def readfromyaml(fname):
-  specdata = {}
   if fname is None:
     dbg1("Reading YAML from stdin")
     stream = sys.stdin
@@ -13,10 +14,20 @@ def readfromyaml(fname):
     stream = open(fname)
     specname = Path(fname).stem
   with stream:
-    try:
-      specraw = yaml.safe_load(stream)
-    except yaml.YAMLError as exc:
-      error(exc)
+    return readfromtext(stream, specname)
+
+def readfromtext(text, specname = "UNKNOWN"):
+  # text can also be a stream
+  try:
+    specraw = yaml.safe_load(text)
+  except yaml.YAMLError as exc:
+    error(exc)
+  return readfromdict(specraw, specname)
+
+def readfromdict(specraw, specname = "UNKNOWN"):
+  specdata = {}
+  if not isinstance(specraw, dict):
+    error("The specification is not a mapping")
   try:
     specdata["property"] = specraw["property"]
     specdata["name"] = specraw.get("name", specname)
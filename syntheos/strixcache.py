@@ -0,0 +1,72 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# On-disk cache of Strix outputs. Strix only sees the booleanized game, so
+# its answer is a function of the property, the partition of the literals
+# and the command line options, whatever atoms the literals stand for.
+# Entries are evicted least recently used first once the directory grows
+# over maxbytes. They are written and read as files, so that a controller
+# can be cached while Strix streams it without holding it in memory.
+
+class StrixCache:
+  def __init__(self, cachedir, maxbytes):
+    self.cachedir = Path(cachedir)
+    self.maxbytes = maxbytes
+    self.cachedir.mkdir(parents=True, exist_ok=True)
+
+  def key(self, strixprop, envlits, syslits, options):
+    normalized = "\n".join([
+      "".join(strixprop.split()),
+      ",".join(sorted(envlits)),
+      ",".join(sorted(syslits)),
+      " ".join(options),
+    ])
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+  def path(self, key):
+    return self.cachedir / (key + ".hoa")
+
+  def open(self, key):
+    # The entry as a text file, or None
+    try:
+      f = open(self.path(key), "r", encoding="utf-8")
+    except FileNotFoundError:
+      return None
+    os.utime(self.path(key))
+    return f
+
+  @contextmanager
+  def writing(self, key):
+    # A text file to write the entry to as it is produced. It only becomes
+    # the entry if the block ends without an exception
+    tmppath = self.cachedir / ("%s.hoa.%d.%d" % (key, os.getpid(), threading.get_ident()))
+    try:
+      with open(tmppath, "w", encoding="utf-8") as f:
+        yield f
+    except BaseException:
+      tmppath.unlink(missing_ok=True)
+      raise
+    os.replace(tmppath, self.path(key))
+    self.evict()
+
+  def put(self, key, strixout):
+    with self.writing(key) as f:
+      f.write(strixout.decode("utf-8"))
+
+  def evict(self):
+    entries = []
+    for path in self.cachedir.glob("*.hoa"):
+      try:
+        st = path.stat()
+      except FileNotFoundError:
+        continue
+      entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+      if total <= self.maxbytes:
+        break
+      path.unlink(missing_ok=True)
+      total -= size
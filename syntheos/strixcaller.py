@@ -1,9 +1,131 @@
+import contextlib
 import time
 import datetime
 import subprocess
+import threading
+import os
+import queue
+import signal
 from .datatypes import *
-from .hoaparser import parsehoa
-from .config import CONFIG
+from .hoaparser import parsehoa, readhoa
+from .config import CONFIG, released
+from .timers import TIMERS, timed
+
+# The HOA output of Strix is parsed while Strix writes it, so the nodes and
+# edges of a large controller are built as its lines arrive and its text
+# is never held in memory: lines going to the cache are written to its file
+# as they are read. The time spent waiting for lines is charged to the strix
+# phase, the rest to parsing.
+
+class StrixError(SyntheosError):
+  pass
+
+def killgroup(proc):
+  try:
+    os.killpg(proc.pid, signal.SIGKILL)
+  except ProcessLookupError:
+    pass
+
+class PipeLines:
+  def __init__(self, pipe, copy):
+    self.pipe = pipe
+    self.copy = copy
+    self.waited = 0.0
+    self.ended = False
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    start = time.perf_counter()
+    with released():
+      line = self.pipe.readline()
+    self.waited += time.perf_counter() - start
+    if not line:
+      self.ended = True
+      raise StopIteration
+    if self.copy is not None:
+      self.copy.write(line)
+    return line
+
+def streamstrix(cmd, littable, copy = None):
+  # The parsed HOA; its lines are also written to the file copy, if any
+  # Strix runs in its own process group, so that a timeout also stops the
+  # processes it spawns and that could keep the pipe open
+  proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, start_new_session=True)
+  killed = threading.Event()
+  def kill():
+    killed.set()
+    killgroup(proc)
+  timer = threading.Timer(CONFIG.strixmaxsecs, kill) if CONFIG.strixmaxsecs is not None else None
+  if timer is not None:
+    timer.start()
+  lines = PipeLines(proc.stdout, copy)
+  start = time.perf_counter()
+  hoainfo, parseerror = None, None
+  try:
+    hoainfo = readhoa(lines, littable)
+  except Exception as e:
+    parseerror = e
+  finally:
+    if hoainfo is None and not lines.ended:
+      killgroup(proc)
+    proc.stdout.close()
+    proc.wait()
+    if timer is not None:
+      timer.cancel()
+  elapsed = time.perf_counter() - start
+  TIMERS.add("strix", lines.waited)
+  TIMERS.add("parsing", elapsed - lines.waited)
+  TIMERS.add("parsehoa", elapsed - lines.waited)
+  if killed.is_set():
+    raise subprocess.TimeoutExpired(cmd, CONFIG.strixmaxsecs)
+  # If the output could not be parsed before Strix closed it, it is us who
+  # killed Strix, and its return code says nothing
+  if parseerror is not None and not lines.ended:
+    raise parseerror
+  if proc.returncode != 0:
+    raise subprocess.CalledProcessError(proc.returncode, cmd)
+  if parseerror is not None:
+    raise parseerror
+  return hoainfo
+
+@timed("parsing", "parsehoa")
+def readcachedhoa(f, littable):
+  with f:
+    return readhoa(f, littable)
+
+# In portfolio mode every configuration of Strix (extra options for it)
+# solves the same game at the same time. The first one to finish well wins,
+# the rest are killed, and its output is parsed once it is complete.
+
+@timed("strix")
+def racestrix(cmd, configs):
+  # The name and output of the winning configuration
+  results = queue.Queue()
+  procs = []
+  def wait(name, proc):
+    out, _ = proc.communicate()
+    results.put((name, proc.returncode, out))
+  try:
+    for name, options in configs:
+      proc = subprocess.Popen(cmd + options, stdout=subprocess.PIPE, start_new_session=True)
+      procs.append(proc)
+      threading.Thread(target=wait, args=(name, proc), daemon=True).start()
+    deadline = None if CONFIG.strixmaxsecs is None else time.monotonic() + CONFIG.strixmaxsecs
+    for _ in configs:
+      try:
+        with released():
+          name, returncode, out = results.get(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+      except queue.Empty:
+        raise subprocess.TimeoutExpired(cmd, CONFIG.strixmaxsecs)
+      if returncode == 0:
+        return name, out
+      dbg1(f"Strix configuration {name} failed with code {returncode}")
+    raise subprocess.CalledProcessError(returncode, cmd)
+  finally:
+    for proc in procs:
+      killgroup(proc)
 
 def callstrix(boolizer):
   reporter = CONFIG.reporter
@@ -22,24 +144,46 @@ def callstrix(boolizer):
       "envvars": envlits,
       "sysvars": syslits,
   }
+  strixcache = CONFIG.strixcache
+  if strixcache is not None:
+    cachekey = strixcache.key(strixprop, envlits, syslits, ["-o", "hoa"])
+    cached = strixcache.open(cachekey)
+    if cached is not None:
+      dbg1("Strix output found in cache")
+      calldata["elapsed"] = 0
+      calldata["cached"] = True
+      reporter.setcall(calldata)
+      return processhoa(readcachedhoa(cached, boolizer.littable), boolizer)
   starttime = time.time()
   dbg1("Calling at " + str(datetime.datetime.fromtimestamp(starttime)))
   dbg1("./strix -f '" + strixprop + "' --ins="+envlitsstr + " --outs="+syslitsstr + " -o hoa")
   try:
-    strixout = subprocess.check_output(["./strix", "-f", strixprop, "--ins="+envlitsstr, "--outs="+syslitsstr, "-o", "hoa"], timeout = CONFIG.strixmaxsecs)
+    cmd = ["./strix", "-f", strixprop, "--ins="+envlitsstr, "--outs="+syslitsstr, "-o", "hoa"]
+    if CONFIG.strixportfolio:
+      winner, strixout = racestrix(cmd, CONFIG.strixportfolio)
+      dbg1(f"Strix configuration {winner} won")
+      calldata["strixconfig"] = winner
+      reporter.addcountto("strixwins", winner)
+      hoainfo = parsehoa(strixout.decode("utf-8"), boolizer.littable)
+      if strixcache is not None:
+        strixcache.put(cachekey, strixout)
+    else:
+      with strixcache.writing(cachekey) if strixcache is not None else contextlib.nullcontext() as copy:
+        hoainfo = streamstrix(cmd, boolizer.littable, copy)
     stoptime = time.time()
     dbg1("Returned at " + str(datetime.datetime.fromtimestamp(stoptime)))
     calldata["elapsed"] = stoptime - starttime
     reporter.setcall(calldata)
   except Exception as e:
-    print(e)
     stoptime = time.time()
     calldata["elapsed"] = stoptime - starttime
     reporter.setcall(calldata)
     reporter.closecall("UNKOWN")
     reporter.dump()
-    exit(-1)
-  hoainfo = parsehoa(strixout.decode("utf-8"), boolizer.littable)
+    raise StrixError(str(e)) from e
+  return processhoa(hoainfo, boolizer)
+
+def processhoa(hoainfo, boolizer):
   boolizer.realizable = hoainfo["realizable"]
-  reporter.closecall(boolizer.realizable)
+  CONFIG.reporter.closecall(boolizer.realizable)
   return hoainfo["nodes"]
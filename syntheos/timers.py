@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+from .config import CONFIG
+
+# Accumulated wall-clock time and number of calls per phase of the
+# pipeline, both for the whole run and for the current CEGAR iteration.
+# They are reported in root.txt. Each check has its own (see config.py).
+
+class Timers:
+  def __init__(self):
+    self.phases = {}
+    self.iteration = {}
+
+  def add(self, phase, seconds, calls=1):
+    for phases in (self.phases, self.iteration):
+      entry = phases.setdefault(phase, {"seconds": 0.0, "calls": 0})
+      entry["seconds"] += seconds
+      entry["calls"] += calls
+
+  def rounded(self, phases):
+    return {phase: {"seconds": round(e["seconds"], 4), "calls": e["calls"]} for phase, e in phases.items()}
+
+  def snapshot(self):
+    return self.rounded(self.phases)
+
+  def newiteration(self):
+    iteration = self.iteration
+    self.iteration = {}
+    return self.rounded(iteration)
+
+  def take(self):
+    phases = self.phases
+    self.phases = {}
+    self.iteration = {}
+    return phases
+
+  def merge(self, phases):
+    for phase, e in phases.items():
+      self.add(phase, e["seconds"], e["calls"])
+
+class CurrentTimers:
+  def __getattr__(self, name):
+    return getattr(CONFIG.setdefault("timers", Timers), name)
+
+TIMERS = CurrentTimers()
+
+@contextmanager
+def timed(*phases):
+  # Also usable as a decorator. Nested phases are all charged.
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    elapsed = time.perf_counter() - start
+    for phase in phases:
+      TIMERS.add(phase, elapsed)
@@ -0,0 +1,28 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# A Strix that answers every game with a one state controller that plays
+# every environment valuation and sets all the system literals
+FAKESTRIX = """#!%s
+import itertools, sys
+ins = [a for a in sys.argv[1:] if a.startswith("--ins=")][0][6:].split(",")
+outs = [a for a in sys.argv[1:] if a.startswith("--outs=")][0][7:].split(",")
+ins, outs = [x for x in ins if x], [x for x in outs if x]
+print("REALIZABLE\\nHOA: v1\\nStates: 1\\nStart: 0")
+print("AP: %%d %%s" %% (len(ins + outs), " ".join('"%%s"' %% a for a in ins + outs)))
+print("--BODY--\\nState: 0 0")
+sysplay = " & ".join(str(len(ins) + i) for i in range(len(outs))) or "t"
+for vals in itertools.product([0, 1], repeat=len(ins)):
+  envplay = " & ".join(("" if v else "!") + str(i) for i, v in enumerate(vals)) or "t"
+  print("[(%%s) & (%%s)] 0" %% (envplay, sysplay))
+print("--END--")
+""" % sys.executable
+
+@pytest.fixture
+def strix(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  (tmp_path / "strix").write_text(FAKESTRIX)
+  (tmp_path / "strix").chmod(0o755)
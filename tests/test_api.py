@@ -0,0 +1,60 @@
+import asyncio
+import sys
+import threading
+import pytest
+from syntheos.api import check_realizability, check_realizability_async, makeargs
+from syntheos.datatypes import SyntheosError
+
+def test_options_as_a_mapping_are_parsed():
+  args = makeargs({"strix_portfolio": "--exploration bfs", "refinement-batch": "3", "no_strixcache": True})
+  assert args.strix_portfolio == ["--exploration bfs"]
+  assert args.refinement_batch == 3
+  assert args.no_strixcache
+
+@pytest.mark.parametrize("options", [{"jobs": "x"}, {"nope": 1}, {"profile": "yes"}, ["--help"], ["--jobs", "x"]])
+def test_bad_options_raise(options):
+  with pytest.raises(SyntheosError):
+    makeargs(options)
+
+def test_bad_options_from_threads_leave_stderr_alone():
+  stderr = sys.stderr
+  errors = []
+  def run(i):
+    for _ in range(20):
+      try:
+        makeargs(["--jobs", "x%d" % i])
+      except Exception as e:
+        errors.append(e)
+  threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  assert len(errors) == 160 and all(isinstance(e, SyntheosError) for e in errors)
+  assert sys.stderr is stderr
+
+SPEC = {
+  "name": "positive",
+  "property": "G([x > 0] & ([e > 0] -> [x > e]))",
+  "variables": [
+    {"name": "x", "type": "Int", "owner": "system"},
+    {"name": "e", "type": "Int", "owner": "environment"},
+  ],
+}
+
+def test_check_realizability(strix):
+  result = check_realizability(dict(SPEC), {"no_strixcache": True})
+  assert result.verdict == "realizable"
+  assert len(result.calls) == 1 and result.stats["literals"] == 3
+  mealy = result.mealy()
+  assert mealy["name"] == "positive" and len(mealy["nodes"]) == 1
+
+def test_concurrent_checks_keep_their_own_state(strix):
+  async def run():
+    return await asyncio.gather(
+      check_realizability_async(dict(SPEC, name="one"), {"no_strixcache": True}),
+      check_realizability_async(dict(SPEC, name="two"), {"no_strixcache": True, "refinement_batch": 2}))
+  one, two = asyncio.run(run())
+  assert (one.name, two.name) == ("one", "two")
+  assert one.verdict == two.verdict == "realizable"
+  assert len(one.calls) == len(two.calls) == 1
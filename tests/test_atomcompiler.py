@@ -0,0 +1,66 @@
+import itertools
+from fractions import Fraction
+import numpy as np
+import pytest
+import z3
+
+from syntheos.atomcompiler import compileatom, evallabel
+from syntheos.boolparser import boolparse
+from syntheos.datatypes import ltlt2z3
+from syntheos.hoaparser import readatom
+
+VARIABLES = [
+  {"name": "x", "type": "Int", "owner": "environment"},
+  {"name": "y", "type": "Int", "owner": "system"},
+  {"name": "r", "type": "Real", "owner": "system"},
+]
+
+def atom(sexpr):
+  return ltlt2z3(readatom(sexpr, VARIABLES))
+
+def z3value(a, valuation):
+  names = {"x": z3.IntVal, "y": z3.IntVal, "r": z3.RealVal}
+  subst = [(z3.Int(n) if n != "r" else z3.Real(n), names[n](str(v))) for n, v in valuation.items()]
+  return z3.is_true(z3.simplify(z3.substitute(a, *subst)))
+
+x, y = z3.Ints("x y")
+INTATOMS = [
+  x / 3 < y, x % 3 == y % -3, -x >= 2 * y, z3.Implies(x > 0, y < x),
+  z3.If(x > y, x, y) == 2, z3.Distinct(x, y + 1), z3.Not(z3.Or(x == y, x < -y)),
+]
+
+@pytest.mark.parametrize("z3atom", INTATOMS, ids=str)
+def test_integer_atoms_agree_with_z3(z3atom):
+  a = compileatom(z3atom)
+  assert a.source is not None and a.vectorsource is not None
+  xs, ys = [], []
+  for xv, yv in itertools.product(range(-7, 8), range(-4, 5)):
+    assert a({"x": xv, "y": yv}) == z3value(z3atom, {"x": xv, "y": yv}), (xv, yv)
+    xs.append(xv)
+    ys.append(yv)
+  columns = {"x": np.array(xs), "y": np.array(ys)}
+  assert a.evalcolumns(columns, len(xs)).tolist() == [a({"x": xv, "y": yv}) for xv, yv in zip(xs, ys)]
+
+def test_real_atoms_are_exact_and_not_vectorized():
+  a = compileatom(atom("(< (/ 3.0 10.0) (* 3.0 r))"))
+  assert a.vectorsource is None
+  assert a({"r": Fraction(1, 10)}) is False
+  assert a({"r": Fraction(1, 10) + Fraction(1, 10**9)}) is True
+  assert a({"r": Fraction(1, 10)}) == z3value(atom("(< (/ 3.0 10.0) (* 3.0 r))"), {"r": Fraction(1, 10)})
+
+def test_unknown_values_give_none():
+  a = compileatom(x / y < 1)
+  assert a({"y": 1}) is None
+  assert a({"x": 1, "y": 0}) is None
+  assert a.vectorsource is None
+  assert a.evalcolumns({"y": np.array([1])}, 1) is None
+  # What is not handled is left to Z3
+  assert compileatom(z3.Distinct(x, y, x + 1))({"x": 1, "y": 2}) is None
+
+def test_labels_are_evaluated_in_kleene_logic():
+  values = {"0": True, "1": False, "2": None}
+  assert evallabel(boolparse("0 & !1"), values) is True
+  assert evallabel(boolparse("1 & 2"), values) is False
+  assert evallabel(boolparse("0 | 2"), values) is True
+  assert evallabel(boolparse("0 & 2"), values) is None
+  assert evallabel(boolparse("!2 | t"), values) is True
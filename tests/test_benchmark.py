@@ -0,0 +1,60 @@
+import argparse
+import os
+import time
+
+from syntheos.benchmark import PHASES, compare, runspec
+
+SPEC = """property: "G([x>0] & ([e > 0] -> [x > e]))"
+variables:
+  - name: x
+    type: Int
+    owner: system
+  - name: e
+    type: Int
+    owner: environment
+"""
+
+def alive(pid):
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+  return True
+
+def result(spec, status="ok", verdict="realizable", wall=10.0, iterations=3):
+  return {"spec": spec, "status": status, "verdict": verdict, "wall": wall, "iterations": iterations}
+
+def test_runs_are_read_back_from_their_report(tmp_path, strix):
+  spec = tmp_path / "spec.yaml"
+  spec.write_text("name: spec\n" + SPEC)
+  args = argparse.Namespace(timeout=60, use_caches=False, syntheos_args=[])
+  r = runspec(str(spec), args)
+  assert (r["status"], r["verdict"], r["iterations"], r["literals"]) == ("ok", "realizable", 1, 3)
+  assert all(r[phase] is not None for phase in ["strix", "parsing"])
+  assert set(PHASES) <= set(r)
+
+def test_regressions_against_a_baseline():
+  args = argparse.Namespace(time_tolerance=0.2, min_seconds=1.0)
+  baseline = [result("a"), result("b"), result("c"), result("d"), result("e")]
+  results = [result("a", wall=11.5), result("b", wall=13.0), result("c", status="timeout"),
+             result("d", iterations=4), result("e", verdict="unrealizable"), result("new", status="error")]
+  regressions = dict(compare(results, baseline, args))
+  assert sorted(regressions) == ["b", "c", "d", "e"]
+  assert regressions["c"] == "status timeout (was ok)"
+
+def test_timeouts_also_stop_strix(tmp_path, monkeypatch):
+  # Strix never answers, and is given more time than the whole run
+  monkeypatch.chdir(tmp_path)
+  strix = tmp_path / "strix"
+  strix.write_text("#!/bin/sh\necho $$ > strix.pid\nexec sleep 60\n")
+  strix.chmod(0o755)
+  spec = tmp_path / "spec.yaml"
+  spec.write_text(SPEC)
+  args = argparse.Namespace(timeout=3, use_caches=False, syntheos_args=["--strixmaxsecs", "100"])
+  result = runspec(str(spec), args)
+  assert result["status"] == "timeout"
+  pid = int((tmp_path / "strix.pid").read_text())
+  deadline = time.monotonic() + 5
+  while alive(pid) and time.monotonic() < deadline:
+    time.sleep(0.1)
+  assert not alive(pid)
@@ -0,0 +1,29 @@
+import pytest
+
+from syntheos.boolparser import boolparse
+from syntheos.datatypes import SyntheosError, ltlt2str
+
+@pytest.mark.parametrize("label, parsed", [
+  ("0", "0"),
+  ("t", "t"),
+  ("!0", "!(0)"),
+  ("0 & 1 | 2", "((0 & 1) | 2)"),
+  ("0 | 1 & 2", "(0 | (1 & 2))"),
+  ("0 & 1 & 2", "((0 & 1) & 2)"),
+  ("!(0 | 1) & !2", "(!((0 | 1)) & !(2))"),
+  ("12&(3|f)", "(12 & (3 | f))"),
+])
+def test_precedence_and_associativity(label, parsed):
+  assert ltlt2str(boolparse(label)) == parsed
+
+def test_printed_labels_parse_back_to_themselves():
+  label = "(!(0) & (1 | t)) | 2"
+  assert ltlt2str(boolparse(ltlt2str(boolparse(label)))) == ltlt2str(boolparse(label))
+
+def test_labels_are_memoized():
+  assert boolparse("0 & !1") is boolparse("0 & !1")
+
+@pytest.mark.parametrize("label", ["", "0 &", "(0 | 1", "0 1", "0 & x", ")"])
+def test_syntax_errors(label):
+  with pytest.raises(SyntheosError, match="Syntax error"):
+    boolparse(label)
@@ -0,0 +1,42 @@
+import pytest
+
+from syntheos import maybenotz3 as mnz3
+from syntheos.config import newcontext
+from syntheos.datatypes import ltlBoolSym, ltlConj, ltlDisj, ltlNeg, ltlt2str
+from syntheos.knowledge import Knowledge, falsifiedclause
+
+a, b, c = ltlBoolSym("a"), ltlBoolSym("b"), ltlBoolSym("c")
+A, B, C = mnz3.Bool("a"), mnz3.Bool("b"), mnz3.Bool("c")
+
+@pytest.fixture(autouse=True)
+def context():
+  with newcontext():
+    yield
+
+def test_falsified_clause_is_read_off_without_distributing():
+  # (a & b) | c is (a | c) & (b | c): with b and c false, b | c is falsified
+  value = {"a": True, "b": False, "c": False}.get
+  clause = falsifiedclause(ltlDisj(ltlConj(a, b), c), True, value)
+  assert sorted(map(ltlt2str, clause)) == ["b", "c"]
+  assert falsifiedclause(ltlDisj(ltlConj(a, b), c), True, {"a": True, "b": True, "c": False}.get) is None
+
+def test_new_clauses_and_implied_formulas():
+  knowledge = Knowledge()
+  knowledge.add(mnz3.Or(A, B))
+  assert knowledge.newclause(ltlDisj(a, ltlDisj(b, c))) is None
+  clause = knowledge.newclause(ltlConj(ltlDisj(a, b), ltlDisj(a, c)))
+  assert sorted(map(ltlt2str, clause)) == ["a", "c"]
+
+def test_excludes_cubes_and_formulas():
+  knowledge = Knowledge()
+  knowledge.add(mnz3.Or(mnz3.Not(A), mnz3.Not(B)))
+  assert knowledge.excludes(ltlConj(a, b))
+  assert not knowledge.excludes(ltlConj(a, ltlNeg(b)))
+  assert knowledge.excludes(ltlConj(ltlDisj(a, c), ltlConj(b, ltlConj(ltlNeg(c), c))))
+
+def test_isnew():
+  knowledge = Knowledge()
+  knowledge.add(A)
+  assert not knowledge.isnew(mnz3.Or(A, B))
+  assert knowledge.isnew(mnz3.Or(mnz3.Not(A), B))
+  assert not knowledge.isnew(mnz3.Implies(B, A))
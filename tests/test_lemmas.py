@@ -0,0 +1,43 @@
+import pytest
+
+from syntheos.config import CONFIG, newcontext
+from syntheos.lemmas import addeagerlemmas, connected, infeasiblecubes
+from syntheos.main import initialize_boolizer
+from syntheos.specreader import readfromdict
+
+SPEC = {
+  "property": "G(([x > 0] | [x < 0] | [x > 2]) & [y > 0])",
+  "variables": [
+    {"name": "x", "type": "Int", "owner": "system"},
+    {"name": "y", "type": "Int", "owner": "system"},
+  ],
+}
+
+@pytest.fixture(autouse=True)
+def context():
+  with newcontext():
+    CONFIG.jobs = 1
+    yield
+
+def readable(boolizer, cubes):
+  atoms = {l: str(atom) for l, [atom, _] in boolizer.littable.items()}
+  return sorted(sorted((atoms[l], p) for l, p in cube) for cube in cubes)
+
+def test_connected():
+  assert connected([{"x"}, {"x", "y"}, {"y", "z"}])
+  assert not connected([{"x"}, {"y"}])
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_only_minimal_cubes_over_shared_variables_are_found(jobs):
+  CONFIG.jobs = jobs
+  boolizer = initialize_boolizer(readfromdict(SPEC))
+  assert readable(boolizer, infeasiblecubes(boolizer, 3)) == [
+    [("0 < x", False), ("2 < x", True)],
+    [("0 < x", True), ("x < 0", True)],
+    [("2 < x", True), ("x < 0", True)],
+  ]
+
+def test_lemmas_become_knowledge():
+  boolizer = initialize_boolizer(readfromdict(SPEC))
+  assert addeagerlemmas(boolizer, 2) == 3
+  assert len(boolizer.littable) == 4
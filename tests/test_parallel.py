@@ -0,0 +1,45 @@
+import itertools
+import pytest
+
+from syntheos.config import CONFIG, newcontext
+from syntheos.datatypes import ltlZ3, LITTY
+from syntheos.boolparser import boolparse
+from syntheos.hoaparser import Edge
+from syntheos.main import initialize_boolizer, thCheck
+from syntheos.parallel import parallelcheck
+from syntheos.specreader import readfromdict
+
+SPEC = {
+  "property": "G(([e > 0] -> [x > e]) & ([x < 0] | [x > 2]) & [x < e + 5])",
+  "variables": [
+    {"name": "x", "type": "Int", "owner": "system"},
+    {"name": "e", "type": "Int", "owner": "environment"},
+  ],
+}
+
+@pytest.fixture(autouse=True)
+def context():
+  with newcontext():
+    CONFIG.jobs = 2
+    yield
+
+def alledges(boolizer):
+  # Every env valuation with every sys valuation, numbered like Strix does
+  lits = list(boolizer.littable.items())
+  transtab = {str(i): ltlZ3(atom) for i, (_, [atom, _]) in enumerate(lits)}
+  envs = [str(i) for i, (_, [_, kind]) in enumerate(lits) if kind == LITTY.ENV]
+  syss = [str(i) for i, (_, [_, kind]) in enumerate(lits) if kind == LITTY.SYS]
+  def cube(names, signs):
+    return " & ".join(("" if s else "!") + n for n, s in zip(names, signs)) or "t"
+  return [Edge(boolparse(cube(envs, e)), boolparse(cube(syss, s)), None, 0, transtab)
+          for e in itertools.product([True, False], repeat=len(envs))
+          for s in itertools.product([True, False], repeat=len(syss))]
+
+def test_workers_flag_the_same_edges_as_a_sequential_check():
+  boolizer = initialize_boolizer(readfromdict(SPEC))
+  boolizer.realizable = True
+  edges = alledges(boolizer)
+  flags = list(parallelcheck(edges, boolizer, thCheck))
+  sequential = [thCheck(edge, boolizer) is not None for edge in edges]
+  assert flags == sequential
+  assert any(flags) and not all(flags)
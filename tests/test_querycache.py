@@ -0,0 +1,57 @@
+import pytest
+
+from syntheos.config import CONFIG, newcontext
+from syntheos.querycache import QueryCache
+
+@pytest.fixture(autouse=True)
+def context():
+  with newcontext():
+    yield
+
+def counting(value):
+  calls = []
+  def compute():
+    calls.append(1)
+    return value
+  return compute, calls
+
+def test_memory_hits_and_lru_eviction():
+  CONFIG.z3cachesize = 2
+  cache = QueryCache()
+  for key in ["a", "b", "a", "c"]:
+    cache.cached("isSat", key, lambda: key)
+  # b was the least recently used when c came in
+  assert cache.stats() == {"isSat": {"memhits": 1, "diskhits": 0, "misses": 3}}
+  cache.cached("isSat", "a", lambda: "a")
+  cache.cached("isSat", "b", lambda: "b")
+  assert cache.stats()["isSat"] == {"memhits": 2, "diskhits": 0, "misses": 4}
+
+def test_the_sqlite_tier_is_shared_between_caches(tmp_path):
+  CONFIG.z3cache = str(tmp_path / "queries.db")
+  compute, calls = counting([1, 2])
+  assert QueryCache().cached("qe", "f", compute, encode=list, decode=tuple) == [1, 2]
+  # A fresh cache, like the one of another run, finds the stored value
+  assert QueryCache().cached("qe", "f", compute, encode=list, decode=tuple) == (1, 2)
+  assert len(calls) == 1
+  assert CONFIG.querycounters["qe"] == {"memhits": 0, "diskhits": 1, "misses": 1}
+
+def test_values_that_cannot_be_encoded_stay_in_memory(tmp_path):
+  CONFIG.z3cache = str(tmp_path / "queries.db")
+  compute, calls = counting(object())
+  QueryCache().cached("unsatcore", "f", compute, encode=lambda v: None)
+  QueryCache().cached("unsatcore", "f", compute, encode=lambda v: None)
+  assert len(calls) == 2
+
+def test_kinds_do_not_share_entries():
+  cache = QueryCache()
+  assert cache.cached("isSat", "f", lambda: True) is True
+  assert cache.cached("qe", "f", lambda: "other") == "other"
+
+def test_each_context_has_its_own_path_and_counters(tmp_path):
+  cache = QueryCache()
+  with newcontext():
+    CONFIG.z3cache = str(tmp_path / "one.db")
+    cache.cached("isSat", "f", lambda: True)
+    assert cache.takestats() == {"isSat": {"memhits": 0, "diskhits": 0, "misses": 1}}
+  assert cache.dbpath is None
+  assert cache.stats() == {}
@@ -0,0 +1,68 @@
+import pytest
+
+from syntheos.config import CONFIG, newcontext
+from syntheos.datatypes import SyntheosError, ltlBoolSym, ltlConj, ltlNeg
+from syntheos.hoaparser import Edge
+from syntheos.main import checkconsistencywith
+from syntheos.reporter import Reporter
+from syntheos.scheduler import Scheduler
+
+def edge(env, sys):
+  return Edge(ltlBoolSym(env), ltlBoolSym(sys), None, 0, {})
+
+@pytest.fixture(autouse=True)
+def context():
+  with newcontext():
+    CONFIG.reporter = Reporter({"name": "test"}, "")
+    CONFIG.jobs = 1
+    CONFIG.inconsistent_edges_tolerance = 0
+    CONFIG.refinement_batch = 1
+    yield
+
+def check(edges, lemmas, scheduler):
+  # lemmas maps the sys atom of the inconsistent edges to what they teach
+  learnt = []
+  def checkf(edge, boolizer):
+    return edge.sysplay.operators[0] if edge.sysplay.operators[0] in lemmas else None
+  def learnf(atom, boolizer):
+    if atom is None:
+      return None
+    learnt.append(atom)
+    return lemmas[atom]
+  keyf = lambda edge: (edge.envplay, edge.sysplay)
+  return checkconsistencywith(edges, None, checkf, learnf, keyf, scheduler), learnt
+
+def test_failed_edges_go_first_then_edges_sharing_their_literals():
+  edges = [edge("0", "1"), edge("0", "4"), edge("0", "2"), edge("2", "3")]
+  scheduler = Scheduler()
+  scheduler.fail((edges[3].envplay, edges[3].sysplay), edges[3])
+  keyed = [((e.envplay, e.sysplay), e) for e in edges]
+  assert [e for _, e in scheduler.order(keyed)] == [edges[3], edges[2], edges[0], edges[1]]
+
+def test_an_edge_with_nothing_new_does_not_stop_the_scan():
+  edges = [edge("0", "1"), edge("0", "2"), edge("0", "3")]
+  consistent, learnt = check(edges, {"1": 0, "3": 1}, Scheduler())
+  assert not consistent
+  assert learnt == ["1", "3"]
+
+def test_the_batch_is_filled_before_stopping():
+  CONFIG.refinement_batch = 2
+  edges = [edge("0", "1"), edge("0", "2"), edge("0", "3"), edge("0", "4")]
+  consistent, learnt = check(edges, {"1": 1, "2": 1, "3": 1}, Scheduler())
+  assert not consistent and learnt == ["1", "2"]
+
+def test_a_scan_that_learns_nothing_is_an_error():
+  with pytest.raises(SyntheosError):
+    check([edge("0", "1"), edge("0", "2")], {"1": 0}, Scheduler())
+
+def test_consistent_controllers_pass():
+  assert check([edge("0", "1")], {}, Scheduler()) == (True, [])
+
+def test_covered_edges_are_skipped_once_something_was_learnt():
+  CONFIG.refinement_batch = 2
+  covered = lambda edge, boolizer: edge.sysplay.operators[0] in ("1", "3")
+  edges = [edge("0", "1"), edge("0", "3"), edge("0", "2")]
+  consistent, learnt = check(edges, {"1": 1, "2": 1, "3": 1}, Scheduler(covered))
+  # 1 is covered too, but nothing had been learnt when it was reached
+  assert not consistent and learnt == ["1", "2"]
+  assert CONFIG.reporter.stats["coverededges"] == 1
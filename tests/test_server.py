@@ -0,0 +1,80 @@
+import json
+import threading
+import urllib.request
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from syntheos.datatypes import SyntheosError
+from syntheos.server import clientoptions, makeserver
+
+@pytest.fixture
+def server():
+  server = makeserver("127.0.0.1:0")
+  server.jobs = 1
+  server.pool = ThreadPoolExecutor(max_workers=1)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  yield server
+  server.shutdown()
+  server.server_close()
+  server.pool.shutdown()
+
+def post(server, request):
+  url = "http://127.0.0.1:%d/check" % server.server_address[1]
+  try:
+    with urllib.request.urlopen(url, json.dumps(request).encode()) as reply:
+      return reply.status, json.load(reply)
+  except urllib.error.HTTPError as e:
+    return e.code, json.load(e)
+
+def test_tuning_options_are_allowed():
+  clientoptions(["--refinement-batch", "4", "--jobs=2", "--no-strixcache", "--strixmaxsecs", "10"])
+
+@pytest.mark.parametrize("options", [
+  ["--reportdir", "/tmp/x"], ["--report=/tmp/x"], ["--z3cache", "/tmp/q.db"], ["--strixcache", "/tmp"],
+  ["--profile"], ["--save-mealy"], ["--save-mealy", "/tmp/m.mealy"], ["--yaml", "/etc/passwd"],
+  ["--serve", "unix:/tmp/s"], ["--strix-portfolio", "-o /tmp/x"],
+])
+def test_filesystem_options_are_refused(options):
+  with pytest.raises(SyntheosError, match="not allowed"):
+    clientoptions(options)
+
+@pytest.mark.parametrize("options", [["--reportdir", "/tmp/x"], ["--jobs", "x"], ["--nope"], ["--help"]])
+def test_bad_options_get_a_400(server, options):
+  code, reply = post(server, {"spec": "", "options": options})
+  assert code == 400 and reply["status"] == "error"
+
+SPEC = """name: positive
+property: "G [x > 0]"
+variables: [{name: x, type: Int, owner: system}]
+"""
+
+def test_specs_are_solved(server, strix):
+  code, reply = post(server, {"spec": SPEC, "options": ["--no-strixcache"], "mealy": True})
+  assert code == 200
+  assert (reply["status"], reply["name"], reply["verdict"]) == ("ok", "positive", "realizable")
+  assert len(reply["mealy"]["nodes"]) == 1
+
+def test_specs_that_cannot_be_solved_get_a_422(server, strix):
+  code, reply = post(server, {"spec": "property: \"G [x > 0]\"\nvariables: []", "options": []})
+  assert code == 422 and reply["status"] == "error"
+
+def test_malformed_requests_get_a_400(server):
+  code, reply = post(server, {"options": []})
+  assert code == 400
+
+def test_health(server):
+  with urllib.request.urlopen("http://127.0.0.1:%d/health" % server.server_address[1]) as reply:
+    assert json.load(reply) == {"status": "ok", "jobs": 1}
+
+def test_serving_never_replaces_a_file_that_is_not_a_socket(tmp_path):
+  path = tmp_path / "notasocket"
+  path.write_text("data")
+  with pytest.raises(SyntheosError, match="not a socket"):
+    makeserver("unix:" + str(path))
+  assert path.read_text() == "data"
+
+def test_stale_sockets_are_replaced(tmp_path):
+  path = str(tmp_path / "s.sock")
+  makeserver("unix:" + path).server_close()
+  makeserver("unix:" + path).server_close()
@@ -0,0 +1,115 @@
+import asyncio
+import functools
+import json
+import os
+import sys
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from shield import Session, convertmealy, read_mealy, read_trace, serve, serve_session
+from syntheos.datatypes import SyntheosError, ltlt2str
+
+# x is a Real from the environment, y an Int from the system: when 3x > 3/10
+# the system plays y < 0, otherwise y >= 0
+REALMEALY = {
+  "name": "real",
+  "variables": [
+    {"name": "x", "type": "Real", "owner": "environment"},
+    {"name": "y", "type": "Int", "owner": "system"},
+  ],
+  "transtab": {"0": "(< (/ 3.0 10.0) (* 3.0 x))", "1": "(< y 0)"},
+  "nodes": [[
+    {"envplay": "0", "sysplay": "1", "outnoden": 0},
+    {"envplay": "!(0)", "sysplay": "!(1)", "outnoden": 0},
+  ]],
+}
+
+def writemealy(tmp_path, data):
+  fname = tmp_path / "controller.yaml"
+  fname.write_text(yaml.dump(data))
+  return str(fname)
+
+def test_real_inputs_are_read_exactly(tmp_path):
+  shield, depth, _ = read_mealy(writemealy(tmp_path, REALMEALY))
+  session = Session(shield, depth)
+  assert session.step({"x": 0.1}, {"y": 5}) == ({"y": 5}, True)
+  assert session.step({"x": 0.10000001}, {"y": 5})[1] is False
+
+def test_replay_agrees_with_streaming_on_reals(tmp_path):
+  xs = [0.1, 0.3, 0.10000001, 0.1, -2.5, 0.09999999, 1e-20, 0.1]
+  ys = [5, -1, 5, -3, 2, 0, 1, 7]
+  trace = tmp_path / "trace.csv"
+  trace.write_text("x,y\n" + "".join("%r,%d\n" % (x, y) for x, y in zip(xs, ys)))
+  mealy = writemealy(tmp_path, REALMEALY)
+
+  shield, depth, _ = read_mealy(mealy)
+  session = Session(shield, depth)
+  streamed = [session.step({"x": x}, {"y": y}) for x, y in zip(xs, ys)]
+
+  shield, depth, _ = read_mealy(mealy)
+  outputs, violations = shield.replay(read_trace(str(trace)), depth)
+  assert violations == [i for i, (_, valid) in enumerate(streamed) if not valid]
+  assert outputs["y"].tolist() == [model["y"] for model, _ in streamed]
+  assert violations == [2, 3]
+
+def test_server_answers_bad_lines_and_keeps_the_session(tmp_path):
+  shield, depth, _ = read_mealy(writemealy(tmp_path, REALMEALY))
+  path = str(tmp_path / "shield.sock")
+
+  async def run():
+    server = await asyncio.start_unix_server(functools.partial(serve_session, shield, depth), path)
+    async with server:
+      reader, writer = await asyncio.open_unix_connection(path)
+      replies = []
+      for line in ['not json', '[{"x": true}, {}]', '[{"x": 1}, {"y": -2}]']:
+        writer.write((line + "\n").encode())
+        await writer.drain()
+        replies.append(json.loads(await reader.readline()))
+      writer.close()
+      return replies
+
+  bad, wrongtype, good = asyncio.run(run())
+  assert "error" in bad and "error" in wrongtype
+  assert good == {"y": -2}
+
+def test_serving_never_replaces_a_file_that_is_not_a_socket(tmp_path):
+  shield, depth, _ = read_mealy(writemealy(tmp_path, REALMEALY))
+  path = tmp_path / "notasocket"
+  path.write_text("data")
+  with pytest.raises(SyntheosError, match="not a socket"):
+    serve(shield, depth, "unix:" + str(path))
+  assert path.read_text() == "data"
+
+# Two nodes: after an x above 3/10 the system must answer y >= 0 once
+TWONODES = dict(REALMEALY, name="twonodes", nodes=[
+  [
+    {"envplay": "0", "sysplay": "1 & !(2)", "outnoden": 1},
+    {"envplay": "!(0)", "sysplay": "!(1) | 2", "outnoden": 0},
+  ],
+  [
+    {"envplay": "t", "sysplay": "!(1)", "outnoden": 0},
+  ],
+])
+TWONODES["transtab"] = dict(REALMEALY["transtab"], **{"2": "(< y (- 5))"})
+
+def test_binary_controllers_read_back_as_the_yaml_ones(tmp_path):
+  yamlfname = writemealy(tmp_path, TWONODES)
+  binfname = str(tmp_path / "controller.mealy")
+  convertmealy(yamlfname, binfname)
+  fromyaml, yamldepth, yamlnodes = read_mealy(yamlfname)
+  frombin, bindepth, binnodes = read_mealy(binfname)
+  assert bindepth == yamldepth
+  assert len(binnodes) == len(yamlnodes)
+  for yamlnode, binnode in zip(yamlnodes, binnodes):
+    assert [(ltlt2str(e.envplay), ltlt2str(e.sysplay), e.outnoden) for e in binnode.edges] == \
+      [(ltlt2str(e.envplay), ltlt2str(e.sysplay), e.outnoden) for e in yamlnode.edges]
+  steps = [({"x": 0.5}, {"y": -1}), ({"x": 0}, {"y": -1}), ({"x": 0}, {"y": 3}),
+           ({"x": 0.1}, {"y": -9}), ({"x": 1}, {"y": -9}), ({"x": 1}, {"y": -1}), ({"x": 2}, {"y": 4})]
+  yamlsession, binsession = Session(fromyaml, yamldepth), Session(frombin, bindepth)
+  for env, sys in steps:
+    yamlreply, binreply = yamlsession.step(env, sys), binsession.step(env, sys)
+    assert binreply[1] == yamlreply[1]
+    if yamlreply[1]:
+      assert binreply[0] == yamlreply[0]
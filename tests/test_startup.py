@@ -0,0 +1,19 @@
+import hashlib
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TABLES = [ROOT / "syntheos" / "ltltparsetab.py", ROOT / "syntheos" / "ltltlextab.py"]
+
+def run(code):
+  return subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+
+def test_sympy_is_only_imported_when_used():
+  assert run("import sys, syntheos.main; print('sympy' in sys.modules)").strip() == "False"
+
+def test_the_shipped_parser_tables_are_current():
+  # PLY rewrites its tables if they do not match the grammar
+  before = [hashlib.sha256(t.read_bytes()).hexdigest() for t in TABLES]
+  run("from syntheos.ltltparser import ltltparse")
+  assert [hashlib.sha256(t.read_bytes()).hexdigest() for t in TABLES] == before
@@ -0,0 +1,40 @@
+import os
+import pytest
+
+from syntheos.strixcache import StrixCache
+
+def test_keys_ignore_spacing_and_the_order_of_the_literals(tmp_path):
+  cache = StrixCache(tmp_path, 1 << 20)
+  key = cache.key("G (e0 -> s0)", ["e0", "e1"], ["s0"], ["-o", "hoa"])
+  assert cache.key("G(e0->s0)", ["e1", "e0"], ["s0"], ["-o", "hoa"]) == key
+  assert cache.key("G(e0->s0)", ["e0"], ["e1", "s0"], ["-o", "hoa"]) != key
+  assert cache.key("G(e0->s0)", ["e0", "e1"], ["s0"], ["-o", "hoa", "--exploration", "bfs"]) != key
+
+def test_entries_are_written_as_they_are_produced(tmp_path):
+  cache = StrixCache(tmp_path, 1 << 20)
+  assert cache.open("k") is None
+  with cache.writing("k") as f:
+    f.write("HOA: v1\n")
+    assert cache.open("k") is None
+  with cache.open("k") as f:
+    assert f.read() == "HOA: v1\n"
+
+def test_failed_writes_leave_no_entry(tmp_path):
+  cache = StrixCache(tmp_path, 1 << 20)
+  with pytest.raises(KeyboardInterrupt):
+    with cache.writing("k") as f:
+      f.write("HOA: v1\n")
+      raise KeyboardInterrupt
+  assert cache.open("k") is None
+  assert os.listdir(tmp_path) == []
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+  cache = StrixCache(tmp_path, 250)
+  cache.put("a", b"x" * 100)
+  os.utime(cache.path("a"), (0, 0))
+  cache.put("b", b"x" * 100)
+  os.utime(cache.path("b"), (1, 1))
+  # Reading a makes b the least recently used entry, which c pushes out
+  cache.open("a").close()
+  cache.put("c", b"x" * 100)
+  assert sorted(os.listdir(tmp_path)) == ["a.hoa", "c.hoa"]
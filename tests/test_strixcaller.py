@@ -0,0 +1,39 @@
+import subprocess
+import sys
+import time
+import pytest
+
+from syntheos.config import CONFIG, newcontext
+from syntheos.strixcaller import streamstrix
+
+def fakestrix(tmp_path, body):
+  script = tmp_path / "strix"
+  script.write_text("import sys, time\n" + body)
+  return [sys.executable, str(script)]
+
+@pytest.fixture(autouse=True)
+def context():
+  with newcontext():
+    CONFIG.strixmaxsecs = None
+    yield
+
+def test_parse_errors_are_not_hidden_by_the_kill(tmp_path):
+  # The output is broken while Strix is still running: we kill it, and the
+  # error is the parse error, not the -9 of the kill
+  cmd = fakestrix(tmp_path, 'print("REALIZABLE\\nStates: two", flush=True)\ntime.sleep(30)\n')
+  start = time.monotonic()
+  with pytest.raises(ValueError):
+    streamstrix(cmd, {})
+  assert time.monotonic() - start < 10
+
+def test_failures_of_strix_are_reported(tmp_path):
+  cmd = fakestrix(tmp_path, 'print("REALIZABLE")\nsys.exit(3)\n')
+  with pytest.raises(subprocess.CalledProcessError) as e:
+    streamstrix(cmd, {})
+  assert e.value.returncode == 3
+
+def test_timeouts_win_over_parse_errors(tmp_path):
+  CONFIG.strixmaxsecs = 1
+  cmd = fakestrix(tmp_path, 'print("REALIZABLE", flush=True)\ntime.sleep(30)\n')
+  with pytest.raises(subprocess.TimeoutExpired):
+    streamstrix(cmd, {})
@@ -0,0 +1,37 @@
+import pytest
+
+from syntheos.config import newcontext
+from syntheos.timers import TIMERS, timed
+
+@pytest.fixture(autouse=True)
+def context():
+  with newcontext():
+    yield
+
+@timed("z3", "thCheck")
+def check():
+  pass
+
+def test_nested_phases_are_all_charged():
+  with timed("strix"):
+    check()
+  check()
+  phases = TIMERS.snapshot()
+  assert {phase: e["calls"] for phase, e in phases.items()} == {"strix": 1, "z3": 2, "thCheck": 2}
+  assert phases["strix"]["seconds"] >= 0
+
+def test_iterations_and_merging():
+  check()
+  assert set(TIMERS.newiteration()) == {"z3", "thCheck"}
+  assert TIMERS.newiteration() == {}
+  taken = TIMERS.take()
+  assert TIMERS.snapshot() == {}
+  TIMERS.merge(taken)
+  TIMERS.merge(taken)
+  assert TIMERS.snapshot()["z3"]["calls"] == 2
+
+def test_each_context_has_its_own_timers():
+  check()
+  with newcontext():
+    assert TIMERS.snapshot() == {}
+  assert TIMERS.snapshot()["z3"]["calls"] == 1